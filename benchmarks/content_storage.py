@@ -0,0 +1,83 @@
+"""
+Compares the posts table size and the list and detail page queries with
+post content stored as is and compressed (the 'compress_content' option),
+on generated posts.
+"""
+import argparse
+import random
+
+from utils import best_of, setup_django, test_database
+
+setup_django()
+
+from django.db import DatabaseError  # noqa: E402
+from blogger import config  # noqa: E402
+from blogger.models import BloggerPost, pack_posts  # noqa: E402
+
+PARAGRAPH = (
+    '<p>Lorem ipsum <a href="http://example.com/%d">dolor</a> sit amet, <b>consectetur</b> adipiscing elit, '
+    'sed do eiusmod tempor incididunt ut labore et dolore magna aliqua %d.</p>\n'
+)
+
+
+def make_posts(count, paragraphs):
+    posts = []
+    for i in range(count):
+        post = BloggerPost(
+            post_id='tag:blogger.com,1999:blog-1.post-%d' % i,
+            title='Post %d' % i,
+            published='2012-01-01T00:00:00',
+            updated='2012-01-01T00:00:00',
+            content=''.join(PARAGRAPH % (i, n) for n in range(paragraphs)),
+        )
+        post.slug = 'post-%d' % i
+        post.update_derived_fields()
+        posts.append(post)
+    return posts
+
+
+def get_table_size(connection):
+    table = BloggerPost._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+            elif connection.vendor == 'sqlite':
+                # needs sqlite built with SQLITE_ENABLE_DBSTAT_VTAB, as most are
+                cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s', [table])
+            else:
+                return None
+            return cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+
+
+def measure(compress, count, paragraphs, repeat):
+    config.compress_content = compress
+    with test_database() as connection:
+        BloggerPost.objects.bulk_create(pack_posts(make_posts(count, paragraphs)))
+        pks = list(BloggerPost.objects.values_list('pk', flat=True))
+
+        list_time = best_of(lambda: list(BloggerPost.objects.listing()[:config.recent_post_count]), repeat=repeat)
+        detail_time = best_of(lambda: BloggerPost.objects.get(pk=random.choice(pks)).content, repeat=repeat)
+        return get_table_size(connection), list_time, detail_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print('%-10s %-12s %12s %10s %10s' % ('size', 'storage', 'table KB', 'list ms', 'detail ms'))
+    for paragraphs in (5, 50, 200):
+        for label, compress in (('plain', False), ('compressed', True)):
+            table_size, list_time, detail_time = measure(compress, args.posts, paragraphs, args.repeat)
+            print('%-10s %-12s %12s %10.3f %10.3f' % (
+                '%.1fKB' % (len(PARAGRAPH) * paragraphs / 1024.0), label,
+                '%.0f' % (table_size / 1024.0) if table_size is not None else '-',
+                list_time * 1000, detail_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
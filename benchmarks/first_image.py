@@ -0,0 +1,52 @@
+"""
+Compares get_first_image_url with the BeautifulSoup implementation it
+replaced, on generated posts of increasing size.
+"""
+import argparse
+
+from utils import best_of, setup_django
+
+setup_django()
+
+from bs4 import BeautifulSoup  # noqa: E402
+from blogger.models import get_first_image_url  # noqa: E402
+
+PARAGRAPH = '<p>Lorem ipsum <a href="http://example.com/%d">dolor</a> sit amet, <b>consectetur</b> adipiscing.</p>\n'
+IMAGE = '<div><a href="http://example.com/big.jpg"><img src="http://example.com/%d.jpg" /></a></div>\n'
+
+
+def get_first_image_url_bs4(entry_html):
+    tree = BeautifulSoup(entry_html, 'html.parser')
+    first_image = tree.find('img')
+    return first_image.get('src') if first_image else ""
+
+
+def make_post(paragraphs, image_at):
+    """
+    ``image_at`` is the fraction of the post before the first image, or None for no image.
+    """
+    parts = [PARAGRAPH % i for i in range(paragraphs)]
+    if image_at is not None:
+        position = int(paragraphs * image_at)
+        parts[position:position] = [IMAGE % i for i in range(3)]
+    return ''.join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('%-10s %-10s %12s %12s %8s' % ('size', 'image', 'bs4 ms', 'streaming ms', 'speedup'))
+    for paragraphs in (10, 100, 1000):
+        for label, image_at in (('start', 0), ('middle', 0.5), ('none', None)):
+            html = make_post(paragraphs, image_at)
+            assert get_first_image_url(html) == get_first_image_url_bs4(html)
+            old = best_of(lambda: get_first_image_url_bs4(html), repeat=args.repeat)
+            new = best_of(lambda: get_first_image_url(html), repeat=args.repeat)
+            print('%-10s %-10s %12.3f %12.3f %7.1fx' % (
+                '%.1fKB' % (len(html) / 1024.0), label, old * 1000, new * 1000, old / new))
+
+
+if __name__ == '__main__':
+    main()
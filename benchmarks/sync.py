@@ -0,0 +1,198 @@
+"""
+Runs generated Blogger atom feeds through the sync path against a throwaway
+SQLite test database and reports entries per second, queries and peak
+memory for each stage: parsing, sync_blog_feed for new, unchanged and
+updated entries, BloggerPost.from_feed one entry at a time, and the hubbub
+callback view with and without the delivery queue.
+
+    python benchmarks/sync.py --entries 1000 --paragraphs 20 --image-density 0.5
+"""
+import argparse
+import json
+import sys
+import time
+
+from utils import setup_django, test_database
+
+setup_django()
+
+import feedparser  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from blogger import config, views  # noqa: E402
+from blogger.models import BloggerPost, HubbubDelivery, HubbubSubscription, sync_blog_feed  # noqa: E402
+
+try:
+    import tracemalloc
+except ImportError:
+    # python 2
+    tracemalloc = None
+
+TOPIC_URL = 'http://benchmark.blogspot.com/feeds/posts/default'
+PARAGRAPH = (
+    '<p>Lorem ipsum <a href="http://example.com/%d">dolor</a> sit amet, <b>consectetur</b> adipiscing elit, '
+    'sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.</p>\n'
+)
+IMAGE = '<div><a href="http://example.com/%d.jpg"><img src="http://example.com/%d-small.jpg" /></a></div>\n'
+ENTRY = """
+  <entry>
+    <id>tag:blogger.com,1999:blog-1.post-%(index)d</id>
+    <published>2012-%(month)02d-01T10:00:00.000-07:00</published>
+    <updated>2012-%(month)02d-01T10:%(minute)02d:00.000-07:00</updated>
+    <title type="text">Benchmark post %(index)d</title>
+    <content type="html">%(content)s</content>
+    <link rel="edit" type="application/atom+xml" href="http://www.blogger.com/feeds/1/posts/default/%(index)d" />
+    <link rel="self" type="application/atom+xml" href="http://www.blogger.com/feeds/1/posts/default/%(index)d" />
+    <link rel="alternate" type="text/html" href="http://benchmark.blogspot.com/2012/01/post-%(index)d.html" />
+    <author><name>Benchmark Author</name></author>
+  </entry>"""
+FEED = """<?xml version='1.0' encoding='UTF-8'?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <id>tag:blogger.com,1999:blog-1</id>
+  <title type="text">Benchmark</title>
+  <link rel="self" type="application/atom+xml" href="%s" />%s
+</feed>"""
+
+
+def escape(html):
+    return html.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def make_feed(entries, paragraphs, image_density, revision=0):
+    """
+    Returns the xml of a feed of ``entries`` posts of ``paragraphs``
+    paragraphs each. ``image_density`` is the fraction of posts with images,
+    which go in the middle of the post. Feeds of a higher ``revision`` have
+    every entry updated later.
+    """
+    items = []
+    for index in range(entries):
+        parts = [PARAGRAPH % n for n in range(paragraphs)]
+        # spread the images evenly over the feed
+        if int((index + 1) * image_density) > int(index * image_density):
+            parts.insert(paragraphs // 2, IMAGE % (index, index))
+        items.append(ENTRY % {
+            'index': index,
+            'month': index % 12 + 1,
+            'minute': revision % 60,
+            'content': escape(''.join(parts)),
+        })
+    return FEED % (TOPIC_URL, ''.join(items))
+
+
+def clear_posts():
+    BloggerPost.objects.all().delete()
+    HubbubDelivery.objects.all().delete()
+
+
+def measure(setup, run):
+    """
+    Returns the (seconds, queries, peak bytes) of ``run``. It runs twice from
+    the state ``setup`` leaves, since tracing memory slows everything down.
+    """
+    setup()
+    # the log holds a limited number of queries, counting from a full one gives 0
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.time()
+        run()
+        elapsed = time.time() - start
+
+    peak = None
+    if tracemalloc is not None:
+        setup()
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, len(queries), peak
+
+
+def post_to_hubbub(xml, queue):
+    def run():
+        config.hubbub_queue = queue
+        request = RequestFactory().post('/pubsubhubbub/', xml, content_type='application/atom+xml')
+        response = views.PubSubHubbub.as_view()(request)
+        assert response.status_code == 204
+    return run
+
+
+def run_benchmarks(entries, paragraphs, image_density):
+    # syncs skip entries older than the stored post, so the updated stage
+    # seeds the older revision and syncs the newer one over it
+    xml = make_feed(entries, paragraphs, image_density, revision=1)
+    old_xml = make_feed(entries, paragraphs, image_density)
+    feed, old_feed = feedparser.parse(xml), feedparser.parse(old_xml)
+    hubbub_queue = config.hubbub_queue
+
+    # bulk_create skips the post_save handler that would ask the hub to subscribe
+    HubbubSubscription.objects.bulk_create([
+        HubbubSubscription(topic_url=TOPIC_URL, host_name='benchmark', verify_token='token', is_verified=True),
+    ])
+    HubbubSubscription.clear_verified_subscriptions()
+
+    def sync_old():
+        clear_posts()
+        sync_blog_feed(old_feed)
+
+    def sync_current():
+        clear_posts()
+        sync_blog_feed(feed)
+
+    def from_feed():
+        for entry in feed.entries:
+            BloggerPost.from_feed(entry)
+
+    stages = [
+        ('feedparser.parse', lambda: None, lambda: feedparser.parse(xml)),
+        ('sync_blog_feed new', clear_posts, lambda: sync_blog_feed(feed)),
+        ('sync_blog_feed unchanged', sync_current, lambda: sync_blog_feed(feed)),
+        ('sync_blog_feed updated', sync_old, lambda: sync_blog_feed(feed)),
+        ('from_feed new', clear_posts, from_feed),
+        ('hubbub post inline', clear_posts, post_to_hubbub(xml, queue=False)),
+        ('hubbub post queued', clear_posts, post_to_hubbub(xml, queue=True)),
+    ]
+    try:
+        for name, setup, run in stages:
+            elapsed, queries, peak = measure(setup, run)
+            yield {
+                'stage': name,
+                'entries': entries,
+                'seconds': elapsed,
+                'entries_per_second': entries / elapsed if elapsed else None,
+                'queries': queries,
+                'peak_memory': peak,
+            }
+    finally:
+        config.hubbub_queue = hubbub_queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=500, help='Entries per feed.')
+    parser.add_argument('--paragraphs', type=int, default=10, help='Paragraphs of html per entry.')
+    parser.add_argument('--image-density', type=float, default=0.5, help='Fraction of entries with an image.')
+    parser.add_argument('--json', action='store_true', help='Print the results as json, e.g. to compare runs.')
+    args = parser.parse_args()
+
+    with test_database():
+        results = list(run_benchmarks(args.entries, args.paragraphs, args.image_density))
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+
+    print('%d entries of %d paragraphs, %.0f%% with images' % (
+        args.entries, args.paragraphs, args.image_density * 100))
+    print('%-26s %12s %10s %9s %10s' % ('stage', 'entries/s', 'ms', 'queries', 'peak KB'))
+    for result in results:
+        print('%-26s %12.0f %10.1f %9d %10s' % (
+            result['stage'], result['entries_per_second'] or 0, result['seconds'] * 1000, result['queries'],
+            '%.0f' % (result['peak_memory'] / 1024.0) if result['peak_memory'] is not None else '-'))
+
+
+if __name__ == '__main__':
+    main()
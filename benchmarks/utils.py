@@ -0,0 +1,41 @@
+"""
+Shared setup for the benchmark scripts. They run against the example
+project's settings, e.g. from the repository root:
+
+    python benchmarks/first_image.py
+"""
+from contextlib import contextmanager
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def setup_django():
+    sys.path.insert(0, os.path.join(ROOT, 'example'))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """
+    Runs the block against a freshly migrated test database, like the test
+    runner does, so benchmarks never touch real data.
+    """
+    from django.db import connection
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def best_of(func, repeat=5, number=1):
+    """
+    Returns the fastest of ``repeat`` runs of ``func``, in seconds per call.
+    """
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
@@ -0,0 +1,90 @@
+"""
+Seeds a throwaway SQLite database with generated posts and reports the
+latency and query count of the post list, post, archive pages and the
+blogger_tags template tags, as served through the Django test client.
+The query budgets enforced by the test suite are in
+blogger.tests.QueryBudgetTests.
+
+    python benchmarks/views.py --posts 2000 --prerender
+"""
+import argparse
+
+from utils import best_of, setup_django, test_database
+
+setup_django()
+
+import feedparser  # noqa: E402
+from django import template  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from blogger import caching, config  # noqa: E402
+from blogger.models import BloggerPost, render_posts, sync_blog_feed  # noqa: E402
+from sync import make_feed  # noqa: E402
+
+TAGS = [
+    ('get_recent_posts',
+     '{% get_recent_posts as posts %}{% for post in posts %}{{ post.get_absolute_url }}{% endfor %}'),
+    ('render_latest_blog_posts', '{% render_latest_blog_posts 5 %}'),
+    ('render_month_links', '{% render_month_links %}'),
+]
+
+
+def get_pages():
+    post = BloggerPost.objects.links().first()
+    return [
+        ('PostList', reverse('blogger:home')),
+        ('PostDetail', post.get_absolute_url()),
+        ('ArchiveYear', reverse('blogger:archive_year', kwargs={'year': post.published.year})),
+        ('ArchiveMonth', reverse('blogger:archive_month', kwargs={
+            'year': post.published.year, 'month': post.published.strftime('%m')})),
+    ]
+
+
+def measure(func, repeat):
+    """
+    Returns the (best seconds, queries) of ``func``, starting every run from
+    an empty cache so the month index tag and cached pages do their work.
+    """
+    def run():
+        caching.get_cache().clear()
+        return func()
+
+    # the log holds a limited number of queries, counting from a full one gives 0
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        run()
+    return best_of(run, repeat=repeat), len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--paragraphs', type=int, default=10, help='Paragraphs of html per post.')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--prerender', action='store_true', help='Turn the prerender_posts option on.')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    config.prerender_posts = args.prerender
+    with test_database():
+        sync_blog_feed(feedparser.parse(make_feed(args.posts, args.paragraphs, image_density=0.5)))
+        if args.prerender:
+            render_posts()
+        client = Client()
+
+        print('%d posts of %d paragraphs%s' % (args.posts, args.paragraphs, ', prerendered' if args.prerender else ''))
+        print('%-26s %10s %9s' % ('view', 'ms', 'queries'))
+        for name, url in get_pages():
+            seconds, queries = measure(lambda: client.get(url), args.repeat)
+            print('%-26s %10.3f %9d' % (name, seconds * 1000, queries))
+        for name, tag in TAGS:
+            tag_template = template.Template('{% load blogger_tags %}' + tag)
+            seconds, queries = measure(lambda: tag_template.render(template.Context({})), args.repeat)
+            print('%-26s %10.3f %9d' % (name, seconds * 1000, queries))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,13 @@
+import django
 from django.contrib import admin
 from django.contrib import messages
 from django.db.models import TextField
 from django.forms.widgets import Widget
 from django.utils.safestring import mark_safe
 
-import feedparser
-from blogger.models import BloggerPost, HubbubSubscription, sync_blog_feed
+from blogger.feeds import sync_feeds
+from blogger.instrumentation import SyncStats
+from blogger.models import BloggerPost, HubbubDelivery, HubbubSubscription, SyncRun
 
 
 class BlogPostWidget(Widget):
@@ -41,10 +43,13 @@ class PostAdmin(admin.ModelAdmin):
 
 
 def sync_subscriptions(modeladmin, request, queryset):
-    new_posts = 0
-    for obj in queryset:
-        new_posts += sync_blog_feed(feedparser.parse(obj.topic_url))
-    messages.success(request, "Synced {0} new posts successfully.".format(new_posts))
+    stats = SyncStats()
+    result = sync_feeds(queryset.values_list('topic_url', flat=True), stats=stats)
+    messages.success(
+        request,
+        "Synced {0.created} new posts successfully ({0.updated} updated, {0.unchanged} unchanged): {1}.".format(
+            result, stats.summary()),
+    )
 
 
 sync_subscriptions.short_description = 'Sync feed from source'
@@ -62,5 +67,49 @@ class HubbubSubscriptionAdmin(admin.ModelAdmin):
         return self.readonly_fields
 
 
+class HubbubDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['topic_url', 'received', 'processed', 'attempts']
+    list_filter = ['processed']
+    fields = readonly_fields = ['topic_url', 'received', 'processed', 'attempts', 'error']
+
+    def has_add_permission(self, request):
+        return False
+
+
+class SyncRunAdmin(admin.ModelAdmin):
+    list_display = [
+        'started', 'source', 'url', 'succeeded', 'duration', 'entries', 'created', 'updated',
+        'fetch_seconds', 'parse_seconds', 'extract_seconds', 'write_seconds', 'bytes_downloaded',
+    ]
+    list_filter = ['source', 'succeeded']
+    date_hierarchy = 'started'
+    readonly_fields = [field.name for field in SyncRun._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    if django.VERSION >= (2, 1):
+        def has_change_permission(self, request, obj=None):
+            # the log is read only, see has_view_permission
+            return False
+
+        def has_view_permission(self, request, obj=None):
+            opts = self.opts
+            return any(
+                request.user.has_perm('%s.%s_%s' % (opts.app_label, action, opts.model_name))
+                for action in ('view', 'change')
+            )
+    else:
+        def has_change_permission(self, request, obj=None):
+            # no view permission before Django 2.1, the changelist and change view need this one; with every
+            # field read only only saving has to be refused
+            return (
+                request.method in ('GET', 'HEAD') and
+                super(SyncRunAdmin, self).has_change_permission(request, obj)
+            )
+
+
 admin.site.register(BloggerPost, PostAdmin)
 admin.site.register(HubbubSubscription, HubbubSubscriptionAdmin)
+admin.site.register(HubbubDelivery, HubbubDeliveryAdmin)
+admin.site.register(SyncRun, SyncRunAdmin)
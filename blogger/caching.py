@@ -0,0 +1,68 @@
+"""
+Thin layer over the Django cache backend named by the 'cache_alias'
+option. Everything cached here is derived from the posts and stored
+under the current generation as the cache key version. A sync that
+changes posts bumps the generation, so every older entry is skipped at
+once and left for the backend to expire.
+"""
+from hashlib import md5
+import time
+
+from django.core.cache import caches
+
+from blogger import config
+
+GENERATION_KEY = 'blogger:generation'
+MONTH_INDEX_KEY = 'blogger:month-index'
+
+
+def get_cache():
+    return caches[config.cache_alias]
+
+
+def get_generation():
+    cache = get_cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # start from the clock so a counter evicted from the cache never
+        # comes back as a generation that was already used.
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def invalidate():
+    cache = get_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, int(time.time() * 1000), None)
+
+
+def get(key):
+    return get_cache().get(key, version=get_generation())
+
+
+def set(key, value):
+    get_cache().set(key, value, config.cache_timeout, version=get_generation())
+
+
+def get_or_set(key, default):
+    """
+    Returns the cached value for ``key``, calling ``default`` to build and
+    cache it when it's missing.
+    """
+    value = get(key)
+    if value is None:
+        value = default()
+        set(key, value)
+    return value
+
+
+def get_page_key(request):
+    return 'blogger:page:%s' % md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+
+
+def get_feed_key(request):
+    # the feed carries absolute links, so it's kept per scheme and host but not per query string
+    return 'blogger:feed:%s' % md5(request.build_absolute_uri(request.path).encode('utf-8')).hexdigest()
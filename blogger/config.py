@@ -10,6 +10,25 @@ blogger_feed_url = 'http://www.blogger.com/feeds/%s/posts/default' % blog_id
 show_teaser = settings.BLOGGER_OPTIONS.get('show_teaser', False)
 teaser_length = settings.BLOGGER_OPTIONS.get('teaser_length', 100)
 recent_post_count = settings.BLOGGER_OPTIONS.get('recent_post_count', 5)
+feed_title = settings.BLOGGER_OPTIONS.get('feed_title', 'Latest posts')
+archive_page_size = settings.BLOGGER_OPTIONS.get('archive_page_size', 50)
+sync_batch_size = settings.BLOGGER_OPTIONS.get('sync_batch_size', 500)
+sync_workers = settings.BLOGGER_OPTIONS.get('sync_workers', 4)
+sync_log = settings.BLOGGER_OPTIONS.get('sync_log', True)
+sync_log_keep_days = settings.BLOGGER_OPTIONS.get('sync_log_keep_days', 30)
+compress_content = settings.BLOGGER_OPTIONS.get('compress_content', False)
+prerender_posts = settings.BLOGGER_OPTIONS.get('prerender_posts', False)
+render_version = settings.BLOGGER_OPTIONS.get('render_version', 1)
+
+search_results = settings.BLOGGER_OPTIONS.get('search_results', 50)
+search_config = settings.BLOGGER_OPTIONS.get('search_config', 'english')
+
+cache_alias = settings.BLOGGER_OPTIONS.get('cache_alias', 'default')
+cache_timeout = settings.BLOGGER_OPTIONS.get('cache_timeout', 60 * 60)
+cache_pages = settings.BLOGGER_OPTIONS.get('cache_pages', False)
 
 hubbub_hub_url = settings.BLOGGER_OPTIONS.get('hubbub_hub_url', 'http://pubsubhubbub.appspot.com/')
+hubbub_queue = settings.BLOGGER_OPTIONS.get('hubbub_queue', False)
+hubbub_max_attempts = settings.BLOGGER_OPTIONS.get('hubbub_max_attempts', 5)
+subscription_cache_timeout = settings.BLOGGER_OPTIONS.get('subscription_cache_timeout', 60)
 disqus_forum = settings.BLOGGER_OPTIONS.get('disqus_forum')
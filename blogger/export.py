@@ -0,0 +1,272 @@
+"""
+Exports the blog as static html, so it can be served without Python.
+
+Every page of ``blogger.urls`` that doesn't depend on the query string is
+rendered through its view, as a GET from an anonymous visitor, to
+``<url>/index.html`` under the output directory: the home page, every post
+and every year and month archive. Later pages of the post list and the
+archives are addressed by query string cursors a static server can't
+follow, so the export follows each list's cursors itself and writes page
+n to ``<url>/page/<n>/index.html``, the path its Newer/Older links point
+to (see ``blogger.pagination.STATIC_PAGE``).
+
+A state file next to the output directory (``<output dir>.blogger-export.json``
+unless given) remembers each post as it was last exported, and later exports
+only render the pages showing posts that were added, changed or removed
+since, plus the home page. It's kept out of the output directory so
+deploying that doesn't publish it. Any page may list the months with posts
+and their counts in a sidebar ({% render_month_links %} in your base
+template), so when those change every page is rendered again.
+"""
+from collections import Counter
+import io
+import json
+import multiprocessing
+import os
+import shutil
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.http import Http404
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+import six
+
+from blogger import rendering
+from blogger.models import BloggerPost
+from blogger.pagination import STATIC_PAGE, get_static_page_url
+
+STATE_FILE = '.blogger-export.json'
+
+
+class ExportResult(object):
+
+    def __init__(self, rendered=0, removed=0):
+        self.rendered = rendered
+        self.removed = removed
+
+    def __repr__(self):
+        return 'ExportResult(rendered=%d, removed=%d)' % (self.rendered, self.removed)
+
+
+def get_state_file(output_dir):
+    return os.path.abspath(output_dir) + STATE_FILE
+
+
+def get_host():
+    """
+    A host name ``ALLOWED_HOSTS`` accepts, so views and the page cache can
+    build absolute urls for the requests the export makes up.
+    """
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+def get_page_file(output_dir, url):
+    return os.path.join(output_dir, url.lstrip('/'), 'index.html')
+
+
+def get_archive_urls(month):
+    year, month = month.split('/')
+    return [
+        reverse('blogger:archive_year', kwargs={'year': year}),
+        reverse('blogger:archive_month', kwargs={'year': year, 'month': month}),
+    ]
+
+
+def get_post_urls(post):
+    slug, month = post[:2]
+    return [reverse('blogger:post', kwargs={'slug': slug})] + get_archive_urls(month)
+
+
+def get_exported_posts():
+    """
+    Returns {post id: [slug, 'YYYY/MM', content hash, updated]} for every
+    post, everything that decides which pages a post shows up on and how.
+    """
+    return dict(
+        (post_id, [slug, published.strftime('%Y/%m'), content_hash, updated.isoformat()])
+        for post_id, slug, published, content_hash, updated in BloggerPost.objects.order_by().values_list(
+            'post_id', 'slug', 'published', 'content_hash', 'updated')
+    )
+
+
+def load_state(path):
+    try:
+        with io.open(path, encoding='utf-8') as state_file:
+            return json.load(state_file)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_state(path, state):
+    with io.open(path, 'w', encoding='utf-8') as state_file:
+        state_file.write(six.text_type(json.dumps(state, sort_keys=True)))
+
+
+def get_changed_urls(old_posts, posts):
+    """
+    Returns the urls to render and the urls whose pages no longer exist,
+    going from the ``old_posts`` to the ``posts`` of ``get_exported_posts``.
+    """
+    render, remove = set(), set()
+    for post_id in set(old_posts) | set(posts):
+        old, new = old_posts.get(post_id), posts.get(post_id)
+        if old == new:
+            continue
+        if new:
+            render.update(get_post_urls(new))
+        if old:
+            # a post that moved or went away leaves its archives changed and its old page behind
+            old_urls = get_post_urls(old)
+            render.update(old_urls[1:])
+            if not new or old[0] != new[0]:
+                remove.add(old_urls[0])
+    if render or remove:
+        render.add(reverse('blogger:home'))
+    return render, remove - render
+
+
+def get_month_counts(posts):
+    return Counter(post[1] for post in posts.values())
+
+
+def get_all_urls(posts):
+    urls = set([reverse('blogger:home')])
+    for post in posts.values():
+        urls.update(get_post_urls(post))
+    return urls
+
+
+def render_page(job):
+    """
+    Renders page ``number`` of ``url`` through its view, starting after the
+    ``after`` cursor, and returns (url, number, status code, content, the
+    cursor of the next page or None). Module level so process pool workers
+    can run it.
+    """
+    url, number, after = job
+    request = RequestFactory(SERVER_NAME=get_host()).get(
+        url, {'after': after} if after else {}, **{STATIC_PAGE: number})
+    match = resolve(url)
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+    except Http404:
+        return url, number, 404, b'', None
+    if hasattr(response, 'render'):
+        response.render()
+    page = (getattr(response, 'context_data', None) or {}).get('page_obj')
+    next_cursor = page.next_cursor if page is not None and response.status_code == 200 else None
+    return url, number, response.status_code, response.content, next_cursor
+
+
+def iter_pages(jobs, render):
+    """
+    Renders the first page of every url, then the next page of every list
+    that has one, and so on, yielding (url, number, status code, content).
+    """
+    while jobs:
+        next_jobs = []
+        for url, number, status_code, content, next_cursor in render(render_page, sorted(jobs)):
+            yield url, number, status_code, content
+            if next_cursor is not None:
+                next_jobs.append((url, number + 1, next_cursor))
+        jobs = next_jobs
+
+
+def render_pages(urls, workers):
+    jobs = [(url, 1, None) for url in urls]
+    if workers > 1 and len(urls) > 1:
+        # forked workers mustn't share the parent's database connections
+        connections.close_all()
+        # spawned workers (Windows, macOS) start from a fresh interpreter without django set up; django.setup
+        # lives outside this module, which can't be imported before setup.
+        pool = multiprocessing.Pool(min(workers, len(urls)), initializer=django.setup)
+        try:
+            for page in iter_pages(jobs, pool.imap_unordered):
+                yield page
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for page in iter_pages(jobs, map):
+            yield page
+
+
+def write_page(output_dir, url, content):
+    path = get_page_file(output_dir, url)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'wb') as page_file:
+        page_file.write(content)
+
+
+def remove_page(output_dir, url):
+    try:
+        os.remove(get_page_file(output_dir, url))
+    except OSError:
+        return False
+    return True
+
+
+def remove_later_pages(output_dir, url, last):
+    """
+    Removes the exported pages of the list at ``url`` after page ``last``,
+    returning how many there were.
+    """
+    pages_dir = os.path.join(output_dir, url.lstrip('/'), 'page')
+    if not os.path.isdir(pages_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(pages_dir):
+        if name.isdigit() and int(name) > last:
+            removed += remove_page(output_dir, get_static_page_url(url, int(name)))
+            shutil.rmtree(os.path.join(pages_dir, name), ignore_errors=True)
+    return removed
+
+
+def export_site(output_dir, workers=None, full=False, state_file=None):
+    """
+    Renders the blog into ``output_dir``, only the pages changed since the
+    last export recorded in ``state_file`` unless ``full`` or the post
+    template changed.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    state_file = state_file or get_state_file(output_dir)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    posts = get_exported_posts()
+    state = load_state(state_file)
+    old_state_file = os.path.join(output_dir, STATE_FILE)
+    if os.path.exists(old_state_file) and os.path.abspath(old_state_file) != os.path.abspath(state_file):
+        # earlier exports kept it in the output directory, where it would be published
+        state = state or load_state(old_state_file)
+        os.remove(old_state_file)
+    version = rendering.get_version()
+
+    old_posts = state.get('posts', {})
+    render, remove = get_changed_urls(old_posts, posts)
+    if full or state.get('version') != version or get_month_counts(old_posts) != get_month_counts(posts):
+        # the changed urls still find the archives of months that went away
+        render.update(get_all_urls(posts))
+
+    result = ExportResult()
+    last_pages = dict((url, 0) for url in render)
+    for url, number, status_code, content in render_pages(render, workers):
+        if status_code == 200:
+            write_page(output_dir, get_static_page_url(url, number), content)
+            last_pages[url] = max(last_pages[url], number)
+            result.rendered += 1
+        elif number == 1:
+            # e.g. an archive month whose last post went away
+            remove.add(url)
+    result.removed = sum(1 for url in remove if remove_page(output_dir, url))
+    # lists that got shorter leave pages behind
+    result.removed += sum(remove_later_pages(output_dir, url, last) for url, last in last_pages.items())
+
+    save_state(state_file, {'version': version, 'posts': posts})
+    return result
@@ -0,0 +1,349 @@
+"""
+Fetching of remote Blogger feeds. Everything here hands parsed entries to
+``blogger.models.sync_blog_entries`` one page at a time.
+"""
+import logging
+from multiprocessing.pool import ThreadPool
+import time
+import traceback
+from xml.etree import ElementTree
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+import feedparser
+from feedparser import FeedParserDict
+import six
+from six.moves.urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    from feedparser.datetimes import _parse_date
+except ImportError:  # feedparser < 6
+    from feedparser import _parse_date
+
+from blogger import config, models
+from blogger.instrumentation import SyncStats, get_content_length, record_sync
+
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+APP_NS = '{http://purl.org/atom/app#}'
+KIND_SCHEME = 'http://schemas.google.com/g/2005#kind'
+POST_KIND = 'http://schemas.google.com/blogger/2008/kind#post'
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+PERMANENT_REDIRECT_STATUSES = (301, 308)
+
+
+def build_feed_url(url, **params):
+    """
+    Adds query string parameters to a feed url. Parameters with a value
+    of None are left out.
+    """
+    params = dict((key, value) for key, value in params.items() if value is not None)
+    if not params:
+        return url
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    query = parse_qsl(query) + sorted(params.items())
+    return urlunsplit((scheme, netloc, path, urlencode(query), fragment))
+
+
+def format_feed_datetime(value):
+    """
+    Formats a datetime the way the Blogger api expects it in
+    ``updated-min``. Naive values are already UTC since that's how
+    ``BloggerPost.from_entry`` stores them.
+    """
+    if timezone.is_aware(value):
+        value = timezone.make_naive(value, timezone.utc)
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def get_latest_update():
+    return models.BloggerPost.objects.aggregate(latest=Max('updated'))['latest']
+
+
+def drop_feed_params(url, *names):
+    """
+    Removes the given query string parameters from a feed url, undoing
+    ``build_feed_url``.
+    """
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(query) if key not in names]
+    return urlunsplit((scheme, netloc, path, urlencode(query), fragment))
+
+
+def is_not_modified(feed):
+    """
+    feedparser reports the status of the first response of a redirect, so
+    a 304 from where the feed moved to comes back as a redirect status
+    with nothing parsed.
+    """
+    status = feed.get('status')
+    if status in REDIRECT_STATUSES:
+        return not feed.get('version') and not feed.entries and not feed.get('bozo')
+    return status == 304
+
+
+def is_fetch_error(feed):
+    """
+    True when a feed couldn't be downloaded at all or the server answered
+    with an error.
+    """
+    status = feed.get('status')
+    return status is None or status >= 400
+
+
+def get_fetch_error(feed, url):
+    """
+    Describes why fetching a feed failed, for the sync log.
+    """
+    status = feed.get('status')
+    reason = 'HTTP %d' % status if status else 'no response'
+    exception = feed.get('bozo_exception')
+    if exception is not None:
+        reason = '%s, %s: %s' % (reason, type(exception).__name__, exception)
+    return 'Fetching %s failed: %s' % (feed.get('href') or url, reason)
+
+
+def get_feed_location(feed, url, *params):
+    """
+    Returns where a feed fetched from ``url`` lives now: the url it was
+    permanently redirected to, less the query string ``params`` added to
+    the request, else ``url``.
+    """
+    if feed.get('status') not in PERMANENT_REDIRECT_STATUSES or not feed.get('href'):
+        return url
+    return drop_feed_params(feed.href, *params)
+
+
+def iter_feed_pages(url, conditional=True, max_pages=None, stats=None, validators=None):
+    """
+    Yields each parsed page of a feed, following its rel="next" links
+    until a page comes back empty or without a next link. When
+    ``conditional`` is set the first page is requested with ``validators``,
+    by default the ones stored for ``url``; if the server answers 304
+    nothing is yielded.
+    """
+    stats = stats or SyncStats()
+    seen = set()
+    if not conditional:
+        validators = {}
+    elif validators is None:
+        validators = models.FeedState.get_validators(url)
+    while url and url not in seen:
+        seen.add(url)
+        with stats.stage('fetch'):
+            feed = feedparser.parse(url, **validators)
+        stats.bytes += get_content_length(feed)
+        validators = {}
+        if is_not_modified(feed):
+            break
+        yield feed
+        if not feed.entries or len(seen) == max_pages:
+            break
+        url = models.get_feed_link(feed.feed.get('links', []), 'next')
+
+
+def crawl_feed(url, since=None, max_results=None, conditional=True, max_pages=None, stats=None):
+    """
+    Syncs every page of a feed, one page at a time so memory use doesn't
+    grow with the size of the blog. When ``since`` is given, only posts
+    updated at or after it are requested. Returns a ``SyncResult``; where
+    the time went is added to ``stats`` if given.
+
+    The first page's ETag and Last-Modified are stored under ``url`` once
+    the whole crawl has been synced, so a failed sync is retried in full on
+    the next run. Requests with ``since`` or ``max_results`` only send and
+    store the Last-Modified, which is the feed's whatever the query, since
+    their ETag only matches that exact query string and a mismatched
+    If-None-Match makes the server ignore If-Modified-Since. A feed that
+    redirects permanently is fetched from its new location from then on.
+    """
+    params = {'max-results': max_results}
+    if since is not None:
+        params.update({'updated-min': format_feed_datetime(since), 'orderby': 'updated'})
+    state = models.FeedState.get_states_for([url])[url]
+    request_url = build_feed_url(state.fetch_url, **params)
+    exact = request_url == state.fetch_url
+    validators = state.validators
+    if not exact:
+        validators.pop('etag', None)
+
+    result = models.SyncResult()
+    first_page = None
+    with record_sync('crawl', request_url, stats=stats) as stats:
+        pages = iter_feed_pages(
+            request_url, conditional=conditional, max_pages=max_pages, stats=stats, validators=validators)
+        for feed in pages:
+            if first_page is None:
+                first_page = feed
+            if is_fetch_error(feed):
+                stats.add_error(get_fetch_error(feed, request_url))
+                logging.warning(stats.errors[-1])
+            result += models.sync_blog_entries(feed.entries, stats=stats)
+
+        if first_page is not None and not is_fetch_error(first_page):
+            location = get_feed_location(first_page, state.fetch_url, *params)
+            models.FeedState.save_validators(url, first_page, keep_etag=not exact, location=location)
+    return result
+
+
+def fetch_feed_page(job):
+    url, fetch_url, validators = job
+    start = time.time()
+    feed = feedparser.parse(fetch_url, **validators)
+    return url, feed, time.time() - start
+
+
+def sync_feeds(urls, workers=None, conditional=True, stats=None):
+    """
+    Syncs the first page of several feeds. The feeds are downloaded and
+    parsed by a pool of threads while this thread writes each one to the
+    database as soon as it's ready, so the database is only ever used from
+    here. Returns a ``SyncResult``; where the time went is added to
+    ``stats`` if given.
+    """
+    urls = list(urls)
+    if not urls:
+        return models.SyncResult()
+    states = models.FeedState.get_states_for(urls)
+    jobs = [(url, states[url].fetch_url, states[url].validators if conditional else {}) for url in urls]
+
+    result = models.SyncResult()
+    with record_sync('feeds', urls[0] if len(urls) == 1 else '', stats=stats) as stats:
+        pool = ThreadPool(min(workers or config.sync_workers, len(jobs)))
+        try:
+            for url, feed, seconds in pool.imap_unordered(fetch_feed_page, jobs):
+                stats.timings['fetch'] += seconds
+                stats.bytes += get_content_length(feed)
+                if is_not_modified(feed):
+                    continue
+                if is_fetch_error(feed):
+                    stats.add_error(get_fetch_error(feed, states[url].fetch_url))
+                    logging.warning(stats.errors[-1])
+                result += models.sync_blog_entries(feed.entries, stats=stats)
+                if not is_fetch_error(feed):
+                    location = get_feed_location(feed, states[url].fetch_url)
+                    models.FeedState.save_validators(url, feed, location=location)
+        finally:
+            pool.terminate()
+            pool.join()
+    return result
+
+
+def process_hubbub_queue(limit=None):
+    """
+    Syncs pending hub deliveries, oldest first, each in its own
+    transaction. Rows are locked while they're applied so several workers
+    can share the queue. A failing delivery keeps its traceback and is
+    retried until it reaches the 'hubbub_max_attempts' option.
+    Returns a ``SyncResult``.
+    """
+    pending = models.HubbubDelivery.objects.pending().values_list('pk', flat=True)
+    if limit:
+        pending = pending[:limit]
+    pending = list(pending)
+    skip_locked = connection.features.has_select_for_update_skip_locked
+
+    result = models.SyncResult()
+    if not pending:
+        # not worth a sync log entry every time an idle worker polls
+        return result
+    with record_sync('queue') as stats:
+        for pk in pending:
+            with transaction.atomic():
+                delivery = models.HubbubDelivery.objects.select_for_update(
+                    skip_locked=skip_locked,
+                ).filter(pk=pk, processed=None).first()
+                if delivery is None:
+                    # another worker got to it first
+                    continue
+
+                delivery.attempts += 1
+                body = bytes(delivery.body)
+                stats.bytes += len(body)
+                try:
+                    with transaction.atomic():
+                        with stats.stage('parse'):
+                            feed = feedparser.parse(body)
+                        result += models.sync_blog_entries(feed.entries, stats=stats)
+                except Exception:
+                    delivery.error = traceback.format_exc()
+                    logging.exception('Error applying hubbub delivery %s for %s', delivery.pk, delivery.topic_url)
+                else:
+                    delivery.processed = timezone.now()
+                    delivery.error = ''
+                delivery.save()
+    return result
+
+
+def get_element_content(element):
+    if element is None:
+        return ''
+    if element.get('type') == 'xhtml':
+        return ''.join(ElementTree.tostring(child).decode('utf-8') for child in element)
+    return element.text or ''
+
+
+def entry_from_element(element):
+    """
+    Converts an atom <entry> element into the same shape of entry
+    feedparser produces, or returns None for entries that aren't published
+    posts (a Blogger export also holds comments, settings and drafts).
+    """
+    kinds = [
+        category.get('term') for category in element.findall(ATOM_NS + 'category')
+        if category.get('scheme') == KIND_SCHEME
+    ]
+    if kinds and POST_KIND not in kinds:
+        return None
+    if element.findtext('%scontrol/%sdraft' % (APP_NS, APP_NS)) == 'yes':
+        return None
+
+    published = element.findtext(ATOM_NS + 'published')
+    updated = element.findtext(ATOM_NS + 'updated') or published
+    return FeedParserDict(
+        id=element.findtext(ATOM_NS + 'id'),
+        title=element.findtext(ATOM_NS + 'title') or '',
+        summary=get_element_content(element.find(ATOM_NS + 'content')),
+        author_detail=FeedParserDict(name=element.findtext('%sauthor/%sname' % (ATOM_NS, ATOM_NS))),
+        links=[
+            FeedParserDict(rel=link.get('rel', 'alternate'), href=link.get('href'))
+            for link in element.findall(ATOM_NS + 'link')
+        ],
+        published=published,
+        published_parsed=_parse_date(published),
+        updated=updated,
+        updated_parsed=_parse_date(updated),
+    )
+
+
+def iter_atom_entries(source):
+    """
+    Yields the post entries of an atom document read incrementally from
+    ``source`` (a path or a binary file object). Each entry is dropped from
+    the tree once it's converted, so memory use stays flat no matter how
+    large the document is.
+    """
+    root = None
+    for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+        if root is None:
+            root = element
+        elif event == 'end' and element.tag == ATOM_NS + 'entry':
+            entry = entry_from_element(element)
+            root.clear()
+            if entry is not None:
+                yield entry
+
+
+def import_feed(source, batch_size=None, stats=None):
+    """
+    Syncs every post in an atom document, committing each batch as it
+    goes. Returns a ``SyncResult``; where the time went is added to
+    ``stats`` if given.
+    """
+    result = models.SyncResult()
+    name = source if isinstance(source, six.string_types) else getattr(source, 'name', '')
+    with record_sync('import', str(name), stats=stats) as stats:
+        entries = stats.timed('parse', iter_atom_entries(source))
+        for batch in models.chunked(entries, batch_size or config.sync_batch_size):
+            result += models.sync_blog_entries(batch, batch_size=batch_size, stats=stats)
+    return result
@@ -0,0 +1,141 @@
+"""
+Timings and counters for syncs.
+
+Every sync fills in a ``SyncStats``: time spent in each stage, entries and
+bytes seen, and the posts created, updated and left unchanged. The stages
+are
+
+* fetch: downloading feeds. feedparser downloads and parses in one call, so
+  for remote feeds this includes parsing; it's summed over the threads of
+  ``sync_feeds``.
+* parse: parsing feeds that were already downloaded, like hub deliveries
+  and imports.
+* extract: working out each entry's digest, first image, text and teaser.
+* write: everything the database does, including search indexing and
+  pre-rendering.
+
+``record_sync`` sends the signals in blogger.signals around a sync and logs
+it as a ``SyncRun`` row, which the admin shows.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+import time
+import traceback
+
+from django.apps import apps
+from django.utils import timezone
+
+from blogger import config, signals
+
+
+class SyncStats(object):
+    STAGES = ('fetch', 'parse', 'extract', 'write')
+
+    def __init__(self):
+        self.timings = dict((stage, 0.0) for stage in self.STAGES)
+        self.entries = 0
+        self.bytes = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+
+    def __repr__(self):
+        return 'SyncStats(entries=%d, bytes=%d, created=%d, updated=%d, unchanged=%d, %s)' % (
+            self.entries, self.bytes, self.created, self.updated, self.unchanged,
+            ', '.join('%s=%.3fs' % (stage, self.timings[stage]) for stage in self.STAGES))
+
+    @contextmanager
+    def stage(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.time() - start
+
+    def timed(self, name, iterable):
+        """
+        Yields from ``iterable``, counting the time spent producing each item
+        towards stage ``name``, e.g. for a feed parsed as it's read.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def summary(self):
+        return '%s, %d bytes' % (
+            ', '.join('%s %.2fs' % (stage, self.timings[stage]) for stage in self.STAGES), self.bytes)
+
+    def add_error(self, message):
+        """
+        Notes something that went wrong without raising, like a feed that
+        couldn't be fetched; the sync is logged as failed.
+        """
+        self.errors.append(message)
+
+    def add_result(self, result):
+        self.entries += result.total
+        self.created += result.created
+        self.updated += result.updated
+        self.unchanged += result.unchanged
+
+
+def get_content_length(feed):
+    """
+    The size of a downloaded feed as the server reported it, or 0.
+    """
+    try:
+        return int(feed.get('headers', {}).get('content-length', 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+@contextmanager
+def record_sync(source, url='', stats=None):
+    """
+    Wraps a sync, yielding the ``SyncStats`` to fill in (``stats`` when
+    given). Failed syncs are logged with their traceback before the
+    exception carries on, or with the errors added to the stats. Runs
+    older than the 'sync_log_keep_days' option are deleted as each new one
+    is logged.
+    """
+    stats = stats or SyncStats()
+    started = timezone.now()
+    start = time.time()
+    error = ''
+    signals.sync_started.send(sender=SyncStats, source=source, url=url)
+    try:
+        yield stats
+    except Exception:
+        error = traceback.format_exc()
+        raise
+    finally:
+        error = error or '\n'.join(stats.errors)
+        run = None
+        if config.sync_log:
+            SyncRun = apps.get_model('blogger', 'SyncRun')
+            run = SyncRun.objects.create(
+                source=source,
+                url=url[:255],
+                started=started,
+                duration=time.time() - start,
+                succeeded=not error,
+                error=error,
+                entries=stats.entries,
+                bytes_downloaded=stats.bytes,
+                created=stats.created,
+                updated=stats.updated,
+                unchanged=stats.unchanged,
+                fetch_seconds=stats.timings['fetch'],
+                parse_seconds=stats.timings['parse'],
+                extract_seconds=stats.timings['extract'],
+                write_seconds=stats.timings['write'],
+            )
+            if config.sync_log_keep_days:
+                SyncRun.objects.filter(started__lt=started - timedelta(days=config.sync_log_keep_days)).delete()
+        signals.sync_finished.send(sender=SyncStats, source=source, url=url, stats=stats, run=run)
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from blogger import config, search
+from blogger.models import BloggerPost, bulk_update, pack_posts, update_archive_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the stored text, word count and teaser of existing posts, reindexes them for search '
+        'and stores their content compressed or not following the compress_content option, then rebuilds '
+        'the archive index'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, dest='batch_size', default=None,
+            help='Number of posts to load and write at a time.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size') or config.sync_batch_size
+        updated = 0
+        last_pk = None
+        while True:
+            posts = BloggerPost.objects.order_by('pk')
+            if last_pk is not None:
+                posts = posts.filter(pk__gt=last_pk)
+            posts = list(posts[:batch_size])
+            if not posts:
+                break
+            for post in posts:
+                post.update_derived_fields()
+            fields = BloggerPost.DERIVED_FIELDS + ('content', 'content_compressed')
+            bulk_update(pack_posts(posts), fields, batch_size=batch_size)
+            search.index_posts([post.pk for post in posts])
+            updated += len(posts)
+            last_pk = posts[-1].pk
+        update_archive_index()
+        sys.stdout.write('Backfilled %d posts\n' % updated)
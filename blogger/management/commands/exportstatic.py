@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from blogger.export import export_site
+
+
+class Command(BaseCommand):
+    help = 'Renders the blog to static html files, only the pages changed since the last export by default'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Directory to write the pages to.')
+        parser.add_argument(
+            '--workers', type=int, dest='workers', default=None,
+            help='Number of processes rendering pages, one per cpu by default.',
+        )
+        parser.add_argument(
+            '--full', action='store_true', dest='full', default=False,
+            help='Render every page again, not only the changed ones.',
+        )
+        parser.add_argument(
+            '--state-file', dest='state_file', default=None,
+            help='File remembering what was exported, <output_dir>.blogger-export.json by default. '
+                 'Keep it out of the output directory.',
+        )
+
+    def handle(self, *args, **options):
+        result = export_site(
+            options['output_dir'],
+            workers=options.get('workers'),
+            full=options.get('full'),
+            state_file=options.get('state_file'),
+        )
+        sys.stdout.write('Exported %d pages (%d removed) to %s\n' % (
+            result.rendered, result.removed, options['output_dir']))
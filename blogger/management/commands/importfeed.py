@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blogger.feeds import import_feed
+from blogger.instrumentation import SyncStats
+
+
+class Command(BaseCommand):
+    help = 'Imports posts from an atom file, like a Blogger export, without loading it all into memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Atom file to import, or - to read from stdin.')
+        parser.add_argument(
+            '--batch-size', type=int, dest='batch_size', default=None,
+            help='Number of posts to write per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+        try:
+            source = stdin if path == '-' else open(path, 'rb')
+        except IOError as e:
+            raise CommandError('Could not open %s: %s' % (path, e))
+
+        stats = SyncStats()
+        try:
+            result = import_feed(source, batch_size=options.get('batch_size'), stats=stats)
+        finally:
+            if source is not stdin:
+                source.close()
+        sys.stdout.write('Imported %d new posts (%d updated, %d unchanged)\n' % (
+            result.created, result.updated, result.unchanged))
+        sys.stdout.write('%s\n' % stats.summary())
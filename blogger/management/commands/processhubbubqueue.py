@@ -0,0 +1,48 @@
+from datetime import timedelta
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from blogger.feeds import process_hubbub_queue
+from blogger.models import HubbubDelivery
+
+
+class Command(BaseCommand):
+    help = 'Applies feed updates pushed by the PubSubHubbub hub'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true', dest='loop', default=False,
+            help='Keep running, polling the queue for new deliveries.',
+        )
+        parser.add_argument(
+            '--interval', type=float, dest='interval', default=5,
+            help='Seconds to wait between polls when the queue is empty, with --loop.',
+        )
+        parser.add_argument(
+            '--limit', type=int, dest='limit', default=None,
+            help='Maximum number of deliveries to apply per poll.',
+        )
+        parser.add_argument(
+            '--keep-days', type=int, dest='keep_days', default=7,
+            help='Delete deliveries applied more than this many days ago.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            result = process_hubbub_queue(limit=options.get('limit'))
+            if result.total:
+                sys.stdout.write('Synced %d new posts (%d updated, %d unchanged)\n' % (
+                    result.created, result.updated, result.unchanged))
+
+            keep_days = options.get('keep_days', 7)
+            HubbubDelivery.objects.filter(processed__lt=timezone.now() - timedelta(days=keep_days)).delete()
+
+            if not options.get('loop'):
+                break
+            if not result.total:
+                time.sleep(options.get('interval', 5))
@@ -0,0 +1,25 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from blogger import config
+from blogger.models import BloggerPost, render_posts
+
+
+class Command(BaseCommand):
+    help = 'Pre-renders the posts whose stored html is missing or out of date, see the prerender_posts option'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true', dest='all', default=False,
+            help='Render every post again, not only the out of date ones.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, dest='batch_size', default=None,
+            help='Number of posts to render and write at a time.',
+        )
+
+    def handle(self, *args, **options):
+        post_ids = BloggerPost.objects.values_list('pk', flat=True) if options.get('all') else None
+        rendered = render_posts(post_ids, batch_size=options.get('batch_size') or config.sync_batch_size)
+        sys.stdout.write('Rendered %d posts\n' % rendered)
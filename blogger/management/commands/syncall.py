@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from blogger.feeds import sync_feeds
+from blogger.instrumentation import SyncStats
+from blogger.models import HubbubSubscription
+from blogger import config
+
+
+class Command(BaseCommand):
+    help = 'Syncs the feeds of every PubSubHubbub subscription, several at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, dest='workers', default=None,
+            help='Number of feeds to download at the same time.',
+        )
+        parser.add_argument(
+            '--force', action='store_true', dest='force', default=False,
+            help="Fetch feeds even if they haven't changed since the last sync.",
+        )
+
+    def handle(self, *args, **options):
+        topic_urls = HubbubSubscription.objects.order_by('topic_url').values_list('topic_url', flat=True)
+        topic_urls = list(topic_urls) or [config.blogger_feed_url]
+        stats = SyncStats()
+        result = sync_feeds(
+            topic_urls, workers=options.get('workers'), conditional=not options.get('force'), stats=stats)
+        sys.stdout.write('Synced %d new posts (%d updated, %d unchanged) from %d feeds\n' % (
+            result.created, result.updated, result.unchanged, len(topic_urls)))
+        sys.stdout.write('%s\n' % stats.summary())
@@ -1,16 +1,39 @@
 import sys
 
 from django.core.management.base import BaseCommand
-import feedparser
 
-from blogger.models import sync_blog_feed
+from blogger.feeds import crawl_feed, get_latest_update
+from blogger.instrumentation import SyncStats
 from blogger import config
 
 
 class Command(BaseCommand):
     help = 'Syncs existing Blogger blog via its RSS feed'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', action='store_true', dest='since', default=False,
+            help='Only fetch posts updated since the newest post already synced.',
+        )
+        parser.add_argument(
+            '--max-results', type=int, dest='max_results', default=None,
+            help='Number of posts to request per feed page.',
+        )
+        parser.add_argument(
+            '--force', action='store_true', dest='force', default=False,
+            help="Fetch the feed even if it hasn't changed since the last sync.",
+        )
+
     def handle(self, *args, **options):
-        feed = feedparser.parse(config.blogger_feed_url)
-        new_posts = sync_blog_feed(feed)
-        sys.stdout.write('Synced %d new posts\n' % new_posts)
+        since = get_latest_update() if options.get('since') else None
+        stats = SyncStats()
+        result = crawl_feed(
+            config.blogger_feed_url,
+            since=since,
+            max_results=options.get('max_results'),
+            conditional=not options.get('force'),
+            stats=stats,
+        )
+        sys.stdout.write('Synced %d new posts (%d updated, %d unchanged)\n' % (
+            result.created, result.updated, result.unchanged))
+        sys.stdout.write('%s\n' % stats.summary())
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloggerpost',
+            name='content_hash',
+            field=models.CharField(max_length=64, blank=True, editable=False),
+        ),
+    ]
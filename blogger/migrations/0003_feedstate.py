@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0002_bloggerpost_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedState',
+            fields=[
+                ('url', models.URLField(max_length=255, serialize=False, primary_key=True)),
+                ('etag', models.CharField(max_length=255, blank=True)),
+                ('modified', models.CharField(max_length=100, blank=True)),
+                ('last_fetched', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0003_feedstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloggerpost',
+            name='plain_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='bloggerpost',
+            name='word_count',
+            field=models.PositiveIntegerField(null=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='bloggerpost',
+            name='teaser_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0004_bloggerpost_text_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HubbubDelivery',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('topic_url', models.URLField(max_length=255)),
+                ('body', models.BinaryField()),
+                ('received', models.DateTimeField(auto_now_add=True)),
+                ('processed', models.DateTimeField(null=True, blank=True, db_index=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name_plural': 'hubbub deliveries',
+            },
+        ),
+    ]
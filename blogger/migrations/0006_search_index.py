@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, OperationalError
+
+from blogger import config
+
+FTS_TABLE = 'blogger_bloggerpost_fts'
+
+
+def create_search_index(apps, schema_editor):
+    """
+    The search index lives outside the model so the model works on every
+    database; see blogger.search. PostgreSQL vectors are built with the
+    'search_config' option searches use.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE blogger_bloggerpost ADD COLUMN search_vector tsvector")
+        schema_editor.execute(
+            "CREATE INDEX blogger_bloggerpost_search_vector ON blogger_bloggerpost USING GIN (search_vector)"
+        )
+        schema_editor.execute(
+            "UPDATE blogger_bloggerpost SET search_vector = "
+            "setweight(to_tsvector(%s, coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector(%s, coalesce(plain_text, '')), 'B')",
+            [config.search_config, config.search_config],
+        )
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE %s USING fts5(post_id UNINDEXED, title, body)" % FTS_TABLE
+            )
+        except OperationalError:
+            # sqlite built without fts5, searching falls back to scanning.
+            return
+        schema_editor.execute(
+            "INSERT INTO %s (post_id, title, body) SELECT post_id, title, plain_text FROM blogger_bloggerpost"
+            % FTS_TABLE
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE blogger_bloggerpost DROP COLUMN search_vector")
+    elif vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS %s" % FTS_TABLE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0005_hubbubdelivery'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
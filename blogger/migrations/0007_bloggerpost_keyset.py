@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='bloggerpost',
+            options={'ordering': ('-published', '-updated', '-post_id')},
+        ),
+        migrations.AddIndex(
+            model_name='bloggerpost',
+            index=models.Index(fields=['-published', '-updated', '-post_id'], name='blogger_post_keyset_idx'),
+        ),
+    ]
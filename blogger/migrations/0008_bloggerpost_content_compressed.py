@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0007_bloggerpost_keyset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloggerpost',
+            name='content_compressed',
+            field=models.BinaryField(null=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0008_bloggerpost_content_compressed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedPost',
+            fields=[
+                ('post', models.OneToOneField(
+                    primary_key=True, related_name='rendered', serialize=False,
+                    on_delete=django.db.models.deletion.CASCADE, to='blogger.BloggerPost',
+                )),
+                ('version', models.CharField(max_length=40)),
+                ('post_updated', models.DateTimeField()),
+                ('content_hash', models.CharField(max_length=64, blank=True)),
+                ('absolute_url', models.CharField(max_length=255)),
+                ('list_html', models.TextField()),
+                ('detail_html', models.TextField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0009_renderedpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncRun',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('source', models.CharField(max_length=20, db_index=True)),
+                ('url', models.CharField(max_length=255, blank=True)),
+                ('started', models.DateTimeField(db_index=True)),
+                ('duration', models.FloatField(default=0)),
+                ('succeeded', models.BooleanField(default=True)),
+                ('error', models.TextField(blank=True)),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('bytes_downloaded', models.PositiveIntegerField(default=0)),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('updated', models.PositiveIntegerField(default=0)),
+                ('unchanged', models.PositiveIntegerField(default=0)),
+                ('fetch_seconds', models.FloatField(default=0)),
+                ('parse_seconds', models.FloatField(default=0)),
+                ('extract_seconds', models.FloatField(default=0)),
+                ('write_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ('-started',),
+            },
+        ),
+    ]
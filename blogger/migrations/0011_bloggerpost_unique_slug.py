@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def dedupe_slugs(apps, schema_editor):
+    """
+    Posts of the same month and title used to share a slug, and only the
+    first could be reached. Later ones get -2, -3 and so on, like the sync
+    path hands out now.
+    """
+    BloggerPost = apps.get_model('blogger', 'BloggerPost')
+    posts = BloggerPost.objects.order_by('published', 'post_id').values_list('post_id', 'slug')
+    taken = set()
+    for post_id, slug in posts:
+        if slug not in taken:
+            taken.add(slug)
+            continue
+        base, suffix = slug, 2
+        while slug in taken:
+            slug, suffix = '%s-%d' % (base, suffix), suffix + 1
+        taken.add(slug)
+        BloggerPost.objects.filter(post_id=post_id).update(slug=slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0010_syncrun'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bloggerpost',
+            name='slug',
+            field=models.SlugField(max_length=255, blank=True, db_index=True),
+        ),
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bloggerpost',
+            name='slug',
+            field=models.SlugField(max_length=255, blank=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.db.models import Count, Max, Min
+from django.db.models.functions import TruncMonth
+
+
+def build_archive_index(apps, schema_editor):
+    BloggerPost = apps.get_model('blogger', 'BloggerPost')
+    ArchiveIndex = apps.get_model('blogger', 'ArchiveIndex')
+    months = BloggerPost.objects.annotate(month=TruncMonth('published')).values('month').annotate(
+        post_count=Count('pk'),
+        first_published=Min('published'),
+        last_published=Max('published'),
+        last_updated=Max('updated'),
+    ).order_by()
+    ArchiveIndex.objects.bulk_create([
+        ArchiveIndex(
+            year=row['month'].year,
+            month=row['month'].month,
+            post_count=row['post_count'],
+            first_published=row['first_published'],
+            last_published=row['last_published'],
+            last_updated=row['last_updated'],
+        )
+        for row in months
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0011_bloggerpost_unique_slug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveIndex',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('post_count', models.PositiveIntegerField()),
+                ('first_published', models.DateTimeField()),
+                ('last_published', models.DateTimeField()),
+                ('last_updated', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ('year', 'month'),
+                'verbose_name_plural': 'archive index',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='archiveindex',
+            unique_together=set([('year', 'month')]),
+        ),
+        migrations.RunPython(build_archive_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogger', '0012_archiveindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedstate',
+            name='location',
+            field=models.URLField(max_length=255, blank=True),
+        ),
+    ]
@@ -1,23 +1,29 @@
-from datetime import datetime
+from datetime import date, datetime
 from hashlib import sha256
 import logging
+import re
+import time
 from time import mktime
 import traceback
 import urllib
+import zlib
 
 try:
     from urllib2 import urlopen, HTTPError
 except ImportError:
     from urllib.request import urlopen, HTTPError
 
-from bs4 import BeautifulSoup
 from django.urls import reverse
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Max, Min, Q
+from django.db.models.functions import TruncMonth
 from django.dispatch import receiver
 from django.template.defaultfilters import striptags, slugify
 from django.utils.encoding import python_2_unicode_compatible
+from six.moves.html_parser import HTMLParser
 
-from blogger import config
+from blogger import caching, config, rendering, search
+from blogger.instrumentation import SyncStats
 
 
 def get_feed_link(links, param):
@@ -31,19 +37,454 @@ def get_all_feed_links(links):
     return [link['href'] for link in links]
 
 
+IMG_TAG = re.compile(r'<img', re.IGNORECASE)
+
+
+class FirstImageFound(Exception):
+    pass
+
+
+class FirstImageParser(HTMLParser):
+    """
+    Remembers the src of the first <img> tag and stops parsing there,
+    instead of building a tree of the whole post.
+    """
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.src = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'img':
+            self.src = dict(attrs).get('src')
+            raise FirstImageFound()
+
+
 def get_first_image_url(entry_html):
-    tree = BeautifulSoup(entry_html, 'html.parser')
-    first_image = tree.find('img')
-    return first_image.get('src') if first_image else ""
+    if not IMG_TAG.search(entry_html):
+        return ""
+    parser = FirstImageParser()
+    try:
+        parser.feed(entry_html)
+        parser.close()
+    except FirstImageFound:
+        return parser.src or ""
+    return ""
+
+
+def chunked(iterable, size):
+    """
+    Yields lists of at most ``size`` items from ``iterable``.
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# compression is paid once per sync, so favour size over speed
+COMPRESSION_LEVEL = 9
+
+
+def compress_content(content):
+    return zlib.compress(content.encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def decompress_content(data):
+    return zlib.decompress(bytes(data)).decode('utf-8')
+
+
+def pack_content(content):
+    """
+    Returns the (content, content_compressed) column values to store for
+    ``content``, following the 'compress_content' option.
+    """
+    if config.compress_content:
+        return '', compress_content(content)
+    return content, None
+
+
+def pack_posts(posts):
+    """
+    Moves the content of unsaved posts into the columns they'll be stored in.
+    The posts' ``content`` is blank afterwards when compressing, so only use
+    this on instances that are about to be bulk written and thrown away.
+    """
+    for post in posts:
+        post.content, post.content_compressed = pack_content(post.content)
+    return posts
+
+
+def get_entry_digest(entry):
+    """
+    Fingerprint of everything we mirror from a feed entry, cheap enough to
+    compute for every entry so unchanged posts can be skipped before any
+    html parsing happens.
+    """
+    parts = [
+        entry.title,
+        entry.author_detail.get('name') or '',
+        entry.summary,
+        entry.published,
+    ] + ['%s %s' % (link['rel'], link['href']) for link in entry.links]
+    return sha256(u'\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def get_entry_updated(entry):
+    return datetime.fromtimestamp(mktime(entry.updated_parsed))
+
+
+class SyncResult(object):
+    """
+    Counts of what a sync did with the entries it was given.
+    """
+
+    def __init__(self, created=0, updated=0, unchanged=0):
+        self.created = created
+        self.updated = updated
+        self.unchanged = unchanged
+
+    def __add__(self, other):
+        return SyncResult(
+            created=self.created + other.created,
+            updated=self.updated + other.updated,
+            unchanged=self.unchanged + other.unchanged,
+        )
 
+    def __eq__(self, other):
+        return isinstance(other, SyncResult) and vars(self) == vars(other)
 
-def sync_blog_feed(feed):
-    new_posts = 0
-    for entry in feed.entries:
-        created = BloggerPost.from_feed(entry)
-        if created:
-            new_posts += 1
-    return new_posts
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'SyncResult(created=%d, updated=%d, unchanged=%d)' % (self.created, self.updated, self.unchanged)
+
+    @property
+    def changed(self):
+        return self.created + self.updated
+
+    @property
+    def total(self):
+        return self.created + self.updated + self.unchanged
+
+
+def is_newer_entry(entry, digest, updated, content_hash):
+    """
+    Whether a feed entry should overwrite the post stored with ``updated``
+    and ``content_hash``: it changed and it isn't older than the post.
+    """
+    entry_updated = get_entry_updated(entry)
+    return (entry_updated, digest) != (updated, content_hash) and entry_updated >= updated
+
+
+# times a batch is tried when a concurrent sync inserts the same posts first
+SYNC_ATTEMPTS = 3
+
+
+def sync_batch(batch, batch_size, stats):
+    """
+    Upserts one batch of entries keyed by id, see ``sync_blog_entries``.
+    Returns its ``SyncResult``, the ids of the posts it wrote and the
+    (year, month) pairs it touched.
+    """
+    result = SyncResult()
+    with stats.stage('write'):
+        existing, published = {}, {}
+        for post_id, updated, content_hash, post_published in BloggerPost.objects.filter(
+            post_id__in=list(batch),
+        ).order_by().values_list('post_id', 'updated', 'content_hash', 'published'):
+            existing[post_id] = (updated, content_hash)
+            published[post_id] = post_published
+
+    to_create, to_update = [], []
+    with stats.stage('extract'):
+        for post_id, entry in batch.items():
+            digest = get_entry_digest(entry)
+            if post_id not in existing:
+                to_create.append(BloggerPost.from_entry(entry, digest=digest))
+            elif is_newer_entry(entry, digest, *existing[post_id]):
+                to_update.append(BloggerPost.from_entry(entry, digest=digest))
+            else:
+                result.unchanged += 1
+        assign_slugs(to_create + to_update)
+        pack_posts(to_create + to_update)
+
+    with stats.stage('write'):
+        BloggerPost.objects.bulk_create(to_create, batch_size=batch_size)
+        bulk_update(to_update, BloggerPost.SYNC_FIELDS, batch_size=batch_size)
+        batch_ids = [post.post_id for post in to_create + to_update]
+        search.index_posts(batch_ids)
+    # a post whose published date moved leaves its old month too
+    months = set(get_month(post.published) for post in to_create + to_update)
+    months.update(get_month(published[post.post_id]) for post in to_update)
+    result.created += len(to_create)
+    result.updated += len(to_update)
+    return result, batch_ids, months
+
+
+def sync_blog_entries(entries, batch_size=None, stats=None):
+    """
+    Upserts feed entries in batches. Each batch costs one query to find the
+    posts we already have plus one bulk insert and one bulk update, all
+    inside a single transaction, and the archive months the batch touched
+    are counted again. Entries whose ``updated`` timestamp and
+    digest match the stored post are skipped without being parsed, and so
+    are entries older than the stored post, e.g. a hub delivery applied
+    after a later one. A batch that collides with posts another sync (say
+    a hub push during a poll) inserted meanwhile is rolled back to its
+    savepoint and tried again, finding those posts this time.
+    Time spent and counts are added to ``stats``, a ``SyncStats``, if given.
+    """
+    batch_size = batch_size or config.sync_batch_size
+    stats = stats or SyncStats()
+    result = SyncResult()
+    changed_ids = []
+    months = set()
+    with transaction.atomic():
+        for batch in chunked(entries, batch_size):
+            # the last occurrence of an entry in a feed wins, like it did when saving one by one
+            batch = dict((entry.id, entry) for entry in batch)
+            for attempt in range(1, SYNC_ATTEMPTS + 1):
+                try:
+                    with transaction.atomic():
+                        batch_result, batch_ids, batch_months = sync_batch(batch, batch_size, stats)
+                    break
+                except IntegrityError:
+                    if attempt == SYNC_ATTEMPTS:
+                        raise
+                    logging.info('Retrying a sync batch a concurrent sync wrote to first')
+            result += batch_result
+            changed_ids.extend(batch_ids)
+            months.update(batch_months)
+
+        with stats.stage('write'):
+            update_archive_index(months)
+
+    with stats.stage('write'):
+        if config.prerender_posts and changed_ids:
+            render_posts(changed_ids, batch_size=batch_size)
+    if result.changed:
+        # callers like the hubbub queue run us inside their own transaction; dropping the cache before
+        # it commits would let other requests cache the old rows under the new generation.
+        transaction.on_commit(caching.invalidate)
+    stats.add_result(result)
+    return result
+
+
+def is_slug_for(slug, base):
+    """
+    Whether ``slug`` is ``base`` or ``base`` with a collision suffix.
+    """
+    return slug == base or re.match(r'%s-\d+$' % re.escape(base), slug) is not None
+
+
+def assign_slugs(posts):
+    """
+    Gives each of ``posts`` a slug no other post has, from its month and
+    title, adding -2, -3 and so on when they collide. A post keeps its
+    current slug as long as its month and title stay the same. Costs one
+    query for the whole batch, for the slugs already taken in its months.
+    """
+    posts = sorted(posts, key=lambda post: (post.published, post.pk))
+    bases = dict((post.pk, post.make_slug()) for post in posts)
+    if not bases:
+        return posts
+    months = Q()
+    for prefix in set(base.rsplit('/', 1)[0] + '/' for base in bases.values()):
+        months |= Q(slug__startswith=prefix)
+    taken = dict(BloggerPost.objects.filter(months).order_by().values_list('slug', 'post_id'))
+    current = dict((post_id, slug) for slug, post_id in taken.items())
+
+    for post in posts:
+        base = bases[post.pk]
+        slug = current.get(post.pk)
+        if slug is None or not is_slug_for(slug, base):
+            # a slug given up stays taken until the next sync, so the bulk
+            # insert never collides with a row the bulk update hasn't moved yet.
+            slug, suffix = base, 2
+            while taken.get(slug, post.pk) != post.pk:
+                slug, suffix = '%s-%d' % (base, suffix), suffix + 1
+        taken[slug] = post.pk
+        post.slug = slug
+    return posts
+
+
+def get_month(published):
+    return published.year, published.month
+
+
+def get_month_rows(months):
+    """
+    Returns the ArchiveIndex rows of the given (year, month) pairs.
+    """
+    rows_filter = Q()
+    for year, month in months:
+        rows_filter |= Q(year=year, month=month)
+    return ArchiveIndex.objects.filter(rows_filter).order_by()
+
+
+def update_archive_index(months=None):
+    """
+    Counts the posts of the given (year, month) pairs again into their
+    ArchiveIndex rows, dropping the rows of months left without posts, or
+    rebuilds the whole index when ``months`` is None. One aggregate query
+    over the months' posts, then the months' rows are locked and updated
+    in place, and missing months inserted, so two syncs counting the same
+    month don't trip over each other's rows.
+    """
+    posts = BloggerPost.objects.order_by()
+    rows = ArchiveIndex.objects.order_by()
+    if months is not None:
+        if not months:
+            return
+        ranges = Q()
+        for year, month in months:
+            start = datetime(year, month, 1)
+            end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+            ranges |= Q(published__gte=start, published__lt=end)
+        posts, rows = posts.filter(ranges), get_month_rows(months)
+
+    stats = posts.annotate(month=TruncMonth('published')).values('month').annotate(
+        post_count=Count('pk'),
+        first_published=Min('published'),
+        last_published=Max('published'),
+        last_updated=Max('updated'),
+    ).order_by()
+    counts = dict(
+        ((row['month'].year, row['month'].month), dict(
+            post_count=row['post_count'],
+            first_published=row['first_published'],
+            last_published=row['last_published'],
+            last_updated=row['last_updated'],
+        ))
+        for row in stats
+    )
+    with transaction.atomic(savepoint=False):
+        # a concurrent sync counting the same months waits here until we commit
+        existing = set(rows.select_for_update().values_list('year', 'month'))
+        emptied = existing.difference(counts)
+        if emptied:
+            get_month_rows(emptied).delete()
+        for year, month in existing.intersection(counts):
+            ArchiveIndex.objects.filter(year=year, month=month).update(**counts[year, month])
+        added = sorted(set(counts).difference(existing))
+        if not added:
+            return
+        try:
+            with transaction.atomic():
+                ArchiveIndex.objects.bulk_create(
+                    [ArchiveIndex(year=year, month=month, **counts[year, month]) for year, month in added]
+                )
+        except IntegrityError:
+            # another sync inserted some of these months after our lock query
+            for year, month in added:
+                ArchiveIndex.objects.update_or_create(year=year, month=month, defaults=counts[year, month])
+
+
+def render_posts(post_ids=None, batch_size=None):
+    """
+    Pre-renders the given posts, or every post without a current fragment,
+    into RenderedPost rows. Returns the number of posts rendered.
+    """
+    batch_size = batch_size or config.sync_batch_size
+    version = rendering.get_version()
+    if post_ids is None:
+        current = RenderedPost.objects.filter(
+            post=models.OuterRef('pk'),
+            version=version,
+            post_updated=models.OuterRef('updated'),
+            content_hash=models.OuterRef('content_hash'),
+        )
+        post_ids = BloggerPost.objects.annotate(
+            is_rendered=models.Exists(current),
+        ).filter(is_rendered=False).order_by().values_list('pk', flat=True)
+
+    rendered = 0
+    for batch in chunked(list(post_ids), batch_size):
+        fragments = []
+        for post in BloggerPost.objects.filter(pk__in=batch).order_by():
+            list_html, detail_html = rendering.render_fragments(post)
+            fragments.append(RenderedPost(
+                post_id=post.pk,
+                version=version,
+                post_updated=post.updated,
+                content_hash=post.content_hash,
+                absolute_url=post.get_absolute_url(),
+                list_html=list_html,
+                detail_html=detail_html,
+            ))
+        with transaction.atomic():
+            RenderedPost.objects.filter(post__in=batch).delete()
+            RenderedPost.objects.bulk_create(fragments)
+        rendered += len(fragments)
+    return rendered
+
+
+def bulk_update(objs, fields, batch_size=None):
+    if not objs:
+        return
+    manager = type(objs[0])._default_manager
+    if hasattr(manager, 'bulk_update'):
+        manager.bulk_update(objs, fields, batch_size=batch_size)
+    else:
+        # Django < 2.2 has no bulk_update
+        for obj in objs:
+            manager.filter(pk=obj.pk).update(**dict((field, getattr(obj, field)) for field in fields))
+
+
+def sync_blog_feed(feed, batch_size=None):
+    """
+    Syncs every entry of a parsed feed and returns the number of new posts.
+    Use ``sync_blog_entries`` for the full ``SyncResult``.
+    """
+    return sync_blog_entries(feed.entries, batch_size=batch_size).created
+
+
+class BloggerPostQuerySet(models.QuerySet):
+    """
+    Querysets that only load the columns a page actually renders. The
+    content column holds the whole post and dwarfs everything else.
+    """
+    LINK_FIELDS = ('post_id', 'slug', 'title', 'published', 'updated')
+
+    def links(self):
+        """
+        For lists of post links, like the archive pages.
+        """
+        return self.only(*self.LINK_FIELDS)
+
+    def teasers(self):
+        """
+        For lists of post teasers, like the recent post template tags.
+        """
+        return self.only(*self.LINK_FIELDS + ('teaser_text', 'word_count'))
+
+    def listing(self):
+        """
+        For pages that render whole posts, skipping the columns derived from the content.
+        """
+        return self.defer('content_hash', 'plain_text', 'teaser_text')
+
+    def prerendered(self):
+        """
+        For pages that paste the pre-rendered fragments instead of the
+        content, see blogger.rendering.
+        """
+        return self.select_related('rendered').defer('content', 'content_compressed')
+
+    def recent(self, cnt=None):
+        return self[:cnt or config.recent_post_count]
+
+    def search(self, query, limit=None):
+        """
+        Posts matching ``query``, best matches first. See blogger.search.
+        """
+        return search.search_posts(self, query, limit)
 
 
 @python_2_unicode_compatible
@@ -51,7 +492,7 @@ class BloggerPost(models.Model):
     """
     The cloned blog posts are stored here.
     """
-    slug = models.SlugField(blank=True, db_index=True)
+    slug = models.SlugField(max_length=255, blank=True, unique=True)
     post_id = models.CharField(max_length=255, primary_key=True)
     published = models.DateTimeField(db_index=True)
     updated = models.DateTimeField(db_index=True)
@@ -63,22 +504,78 @@ class BloggerPost(models.Model):
     link_self = models.URLField(blank=True)
     link_alternate = models.URLField(blank=True)
     author = models.CharField(max_length=255, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    plain_text = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(null=True, editable=False)
+    teaser_text = models.TextField(blank=True, editable=False)
+    # with 'compress_content' on, content is stored here zlib compressed and the content column is left blank.
+    content_compressed = models.BinaryField(null=True, editable=False)
+
+    # columns computed from the content so they don't need to be worked out on every request.
+    DERIVED_FIELDS = ('plain_text', 'word_count', 'teaser_text')
 
-    objects = models.Manager()
+    # every column the feed owns, i.e. what gets rewritten when a post is synced again.
+    SYNC_FIELDS = (
+        'slug', 'published', 'updated', 'title', 'content', 'first_image_url',
+        'link_edit', 'link_self', 'link_alternate', 'author', 'content_hash', 'content_compressed',
+    ) + DERIVED_FIELDS
+
+    objects = BloggerPostQuerySet.as_manager()
 
     class Meta(object):
-        ordering = ('-published', '-updated')
+        ordering = ('-published', '-updated', '-post_id')
+        indexes = [
+            # the keyset used to paginate posts, see blogger.pagination
+            models.Index(fields=['-published', '-updated', '-post_id'], name='blogger_post_keyset_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super(BloggerPost, cls).from_db(db, field_names, values)
+        # the month the post was archived under, in case a save moves it
+        post._loaded_published = post.__dict__.get('published')
+        compressed = post.__dict__.get('content_compressed')
+        if compressed is not None:
+            post.content = decompress_content(compressed)
+        return post
+
+    def refresh_from_db(self, using=None, fields=None):
+        # loading a deferred content has to bring the compressed copy along
+        if fields is not None and 'content' in fields and 'content_compressed' not in fields:
+            fields = list(fields) + ['content_compressed']
+        super(BloggerPost, self).refresh_from_db(using=using, fields=fields)
+
     def save(self, *args, **kwargs):
-        self.slug = "%s/%s" % (self.published.strftime("%Y/%m"), slugify(self.title))
-        super(BloggerPost, self).save(*args, **kwargs)
+        assign_slugs([self])
+        self.update_derived_fields()
+        content = self.content
+        self.content, self.content_compressed = pack_content(content)
+        try:
+            super(BloggerPost, self).save(*args, **kwargs)
+        finally:
+            self.content = content
+
+    def make_slug(self):
+        """
+        The slug the post would have without collisions, see ``assign_slugs``.
+        """
+        # leave room for a collision suffix within the column
+        return "%s/%s" % (self.published.strftime("%Y/%m"), slugify(self.title)[:230])
+
+    def update_derived_fields(self):
+        words = striptags(self.content).split()
+        self.plain_text = ' '.join(words)
+        self.word_count = len(words)
+        self.teaser_text = ' '.join(words[:config.teaser_length])
 
     @property
     def wordcount(self):
-        return len(striptags(self.content).split())
+        if self.word_count is None:
+            self.update_derived_fields()
+        return self.word_count
 
     @property
     def remaining_words(self):
@@ -86,47 +583,125 @@ class BloggerPost(models.Model):
 
     @property
     def teaser(self):
-        return ' '.join(striptags(self.content).split()[:config.teaser_length])
+        if self.word_count is None:
+            self.update_derived_fields()
+        return self.teaser_text
 
     @property
     def list_content(self):
         return self.teaser if config.show_teaser else self.content
 
     def get_absolute_url(self):
-        return reverse('blogger:post', kwargs={'slug': self.slug})
+        # templates ask for it several times per post and reverse() isn't free.
+        cached = getattr(self, '_absolute_url', None)
+        if cached is None or cached[0] != self.slug:
+            cached = self._absolute_url = (self.slug, reverse('blogger:post', kwargs={'slug': self.slug}))
+        return cached[1]
+
+    def get_rendered(self):
+        """
+        Returns the post's pre-rendered fragments, or None when there are none
+        or they're out of date.
+        """
+        try:
+            rendered = self.rendered
+        except RenderedPost.DoesNotExist:
+            return None
+        if rendered.version != rendering.get_version() or rendered.post_updated != self.updated:
+            return None
+        return rendered
 
     @staticmethod
-    def from_feed(entry):
+    def from_entry(entry, digest=None):
         """
-        Creates a new BloggerPost from atom feed. See the below link for schema:
+        Builds an unsaved BloggerPost from an atom feed entry. See the below link for schema:
         http://code.google.com/apis/blogger/docs/2.0/developers_guide_protocol.html#RetrievingWithoutQuery
         """
-        post_id = entry.id
-        post_data = dict(
+        post = BloggerPost(
+            post_id=entry.id,
             title=entry.title,
             author=entry.author_detail.get('name'),
             content=entry.summary,
             first_image_url=get_first_image_url(entry.summary),
-            link_edit=get_feed_link(entry.links, 'edit'),
-            link_self=get_feed_link(entry.links, 'self'),
-            link_alternate=get_feed_link(entry.links, 'alternate'),
+            link_edit=get_feed_link(entry.links, 'edit') or '',
+            link_self=get_feed_link(entry.links, 'self') or '',
+            link_alternate=get_feed_link(entry.links, 'alternate') or '',
             published=datetime.fromtimestamp(mktime(entry.published_parsed)),
-            updated=datetime.fromtimestamp(mktime(entry.updated_parsed)),
+            updated=get_entry_updated(entry),
+            content_hash=digest or get_entry_digest(entry),
         )
-        post, created = BloggerPost.objects.get_or_create(
-            post_id=post_id,
-            defaults=post_data,
-        )
-        if not created:
-            post = BloggerPost(post_id=post_id, **post_data)
-            post.save()
+        post.slug = post.make_slug()
+        post.update_derived_fields()
+        return post
 
-        return created
+    @staticmethod
+    def from_feed(entry):
+        """
+        Creates or updates a single BloggerPost from an atom feed entry.
+        Returns True when the post is new.
+        """
+        return sync_blog_entries([entry]).created == 1
 
     @classmethod
     def get_latest_posts(cls, cnt=None):
-        cnt = cnt or config.recent_post_count
-        return cls.objects.all()[:cnt]
+        return cls.objects.recent(cnt)
+
+    @classmethod
+    def get_month_index(cls):
+        """
+        Returns (month, post count) pairs for every month with posts, oldest first.
+        Cached until the next sync changes the posts.
+        """
+        return [(month.date, month.post_count) for month in ArchiveIndex.get_months()]
+
+
+class RenderedPost(models.Model):
+    """
+    The blogger/post_content.html fragments of a post, as rendered on list
+    pages and on the post's own page. See blogger.rendering.
+    """
+    post = models.OneToOneField(BloggerPost, primary_key=True, related_name='rendered', on_delete=models.CASCADE)
+    version = models.CharField(max_length=40)
+    post_updated = models.DateTimeField()
+    content_hash = models.CharField(max_length=64, blank=True)
+    absolute_url = models.CharField(max_length=255)
+    list_html = models.TextField()
+    detail_html = models.TextField()
+
+
+@python_2_unicode_compatible
+class ArchiveIndex(models.Model):
+    """
+    The number of posts of every month with posts and when its first and
+    last posts were published, kept up to date by syncs and by posts saved
+    and deleted one at a time, so the archive pages and month links don't
+    aggregate over every post. ``update_archive_index()`` rebuilds it.
+    """
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    post_count = models.PositiveIntegerField()
+    first_published = models.DateTimeField()
+    last_published = models.DateTimeField()
+    last_updated = models.DateTimeField()
+
+    class Meta(object):
+        ordering = ('year', 'month')
+        unique_together = ('year', 'month')
+        verbose_name_plural = 'archive index'
+
+    def __str__(self):
+        return '%d/%02d' % (self.year, self.month)
+
+    @property
+    def date(self):
+        return date(self.year, self.month, 1)
+
+    @classmethod
+    def get_months(cls):
+        """
+        Returns every row, oldest month first. Cached until the next sync changes the posts.
+        """
+        return caching.get_or_set(caching.MONTH_INDEX_KEY, lambda: list(cls.objects.all()))
 
 
 @python_2_unicode_compatible
@@ -189,10 +764,206 @@ class HubbubSubscription(models.Model):
 
     @classmethod
     def get_by_url_list(cls, url_list):
-        try:
-            return cls.objects.get(topic_url__in=url_list)
-        except cls.DoesNotExist:
-            return None
+        """
+        Returns every verified subscription whose topic is in ``url_list``,
+        without hitting the database.
+        """
+        verified = cls.get_verified_subscriptions()
+        topic_urls = []
+        for url in url_list:
+            if url in verified and url not in topic_urls:
+                topic_urls.append(url)
+        return [verified[url] for url in topic_urls]
+
+    # verified subscriptions by topic url. Shared by the whole process, dropped
+    # whenever a subscription is saved or deleted here and reloaded after
+    # 'subscription_cache_timeout' seconds to pick up changes made by other processes.
+    _verified_subscriptions = None
+    _verified_subscriptions_loaded = 0
+
+    @classmethod
+    def get_verified_subscriptions(cls):
+        age = time.time() - cls._verified_subscriptions_loaded
+        if cls._verified_subscriptions is None or age > config.subscription_cache_timeout:
+            cls._verified_subscriptions = dict(
+                (subscription.topic_url, subscription) for subscription in cls.objects.filter(is_verified=True)
+            )
+            cls._verified_subscriptions_loaded = time.time()
+        return cls._verified_subscriptions
+
+    @classmethod
+    def clear_verified_subscriptions(cls):
+        cls._verified_subscriptions = None
+
+
+class HubbubDeliveryQuerySet(models.QuerySet):
+
+    def pending(self):
+        return self.filter(processed=None, attempts__lt=config.hubbub_max_attempts).order_by('pk')
+
+
+@python_2_unicode_compatible
+class HubbubDelivery(models.Model):
+    """
+    A feed update pushed by the hub, stored as received so the request can
+    be answered right away. ``process_hubbub_queue`` applies it later.
+    """
+    topic_url = models.URLField(max_length=255)
+    body = models.BinaryField()
+    received = models.DateTimeField(auto_now_add=True)
+    processed = models.DateTimeField(null=True, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    objects = HubbubDeliveryQuerySet.as_manager()
+
+    class Meta(object):
+        verbose_name_plural = 'hubbub deliveries'
+
+    def __str__(self):
+        return self.topic_url
+
+
+@python_2_unicode_compatible
+class FeedState(models.Model):
+    """
+    Validators from the last successful fetch of a feed url, sent back on
+    the next fetch so an unchanged feed costs a single 304 response, and
+    the url the feed was permanently redirected to, fetched instead of
+    ``url`` from then on.
+    """
+    url = models.URLField(max_length=255, primary_key=True)
+    etag = models.CharField(max_length=255, blank=True)
+    modified = models.CharField(max_length=100, blank=True)
+    location = models.URLField(max_length=255, blank=True)
+    last_fetched = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.url
+
+    @property
+    def fetch_url(self):
+        return self.location or self.url
+
+    @property
+    def validators(self):
+        values = {'etag': self.etag, 'modified': self.modified}
+        return dict((key, value) for key, value in values.items() if value)
+
+    @classmethod
+    def get_states_for(cls, urls):
+        """
+        Returns the state of each url, keyed by url. Urls never fetched
+        get a new, unsaved one.
+        """
+        states = dict((url, cls(url=url)) for url in urls)
+        states.update((state.url, state) for state in cls.objects.filter(url__in=urls))
+        return states
+
+    @classmethod
+    def get_validators(cls, url):
+        """
+        Returns the keyword arguments ``feedparser.parse`` needs to make a
+        conditional request for ``url``.
+        """
+        return cls.get_validators_for([url])[url]
+
+    @classmethod
+    def get_validators_for(cls, urls):
+        """
+        Like ``get_validators`` for several urls at once, keyed by url.
+        """
+        return dict((url, state.validators) for url, state in cls.get_states_for(urls).items())
+
+    @classmethod
+    def save_validators(cls, url, feed, keep_etag=False, location=None):
+        """
+        Stores the validators of ``feed``, fetched for ``url``, and where
+        the feed lives now when ``location`` is given.
+        """
+        defaults = {'modified': feed.get('modified') or ''}
+        if not keep_etag:
+            defaults['etag'] = feed.get('etag') or ''
+        if location is not None:
+            defaults['location'] = '' if location == url else location
+        cls.objects.update_or_create(url=url, defaults=defaults)
+
+
+@python_2_unicode_compatible
+class SyncRun(models.Model):
+    """
+    One sync and where its time went, logged by
+    ``blogger.instrumentation.record_sync``.
+    """
+    source = models.CharField(max_length=20, db_index=True)
+    url = models.CharField(max_length=255, blank=True)
+    started = models.DateTimeField(db_index=True)
+    duration = models.FloatField(default=0)
+    succeeded = models.BooleanField(default=True)
+    error = models.TextField(blank=True)
+    entries = models.PositiveIntegerField(default=0)
+    bytes_downloaded = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    fetch_seconds = models.FloatField(default=0)
+    parse_seconds = models.FloatField(default=0)
+    extract_seconds = models.FloatField(default=0)
+    write_seconds = models.FloatField(default=0)
+
+    class Meta(object):
+        ordering = ('-started',)
+
+    def __str__(self):
+        return '%s %s' % (self.source, self.started)
+
+
+@receiver(models.signals.post_save, sender=BloggerPost, dispatch_uid="BloggerPostArchived")
+@receiver(models.signals.post_delete, sender=BloggerPost, dispatch_uid="BloggerPostUnarchived")
+def post_archive_handler(sender, **kwargs):
+    """
+    Connected ahead of ``post_changed_handler`` so the cache is dropped after
+    the archive index changes.
+    """
+    instance = kwargs['instance']
+    months = set([get_month(instance.published)])
+    if getattr(instance, '_loaded_published', None) is not None:
+        months.add(get_month(instance._loaded_published))
+    update_archive_index(months)
+    instance._loaded_published = instance.published
+
+
+@receiver(models.signals.post_save, sender=BloggerPost, dispatch_uid="BloggerPostSaved")
+@receiver(models.signals.post_delete, sender=BloggerPost, dispatch_uid="BloggerPostDeleted")
+def post_changed_handler(sender, **kwargs):
+    """
+    Sync writes in bulk and invalidates on its own; this covers posts
+    saved or deleted one at a time, e.g. from the admin. Like the sync it
+    waits for the transaction to commit.
+    """
+    transaction.on_commit(caching.invalidate)
+
+
+@receiver(models.signals.post_save, sender=BloggerPost, dispatch_uid="BloggerPostIndexed")
+def post_saved_search_handler(sender, **kwargs):
+    search.index_posts([kwargs['instance'].pk], using=kwargs['using'])
+
+
+@receiver(models.signals.post_delete, sender=BloggerPost, dispatch_uid="BloggerPostUnindexed")
+def post_deleted_search_handler(sender, **kwargs):
+    search.remove_posts([kwargs['instance'].pk], using=kwargs['using'])
+
+
+@receiver(models.signals.post_save, sender=BloggerPost, dispatch_uid="BloggerPostRendered")
+def post_saved_render_handler(sender, **kwargs):
+    """
+    A post saved on its own may change without its ``updated`` changing,
+    so its fragments are rendered again or dropped.
+    """
+    if config.prerender_posts:
+        render_posts([kwargs['instance'].pk])
+    else:
+        RenderedPost.objects.filter(post=kwargs['instance'].pk).delete()
 
 
 @receiver(models.signals.post_save, sender=HubbubSubscription, dispatch_uid="HubbubRegister")
@@ -203,3 +974,9 @@ def subscription_handler(sender, **kwargs):
     if kwargs['created']:
         instance = kwargs['instance']
         instance.send_subscription_request()
+
+
+@receiver(models.signals.post_save, sender=HubbubSubscription, dispatch_uid="HubbubSaved")
+@receiver(models.signals.post_delete, sender=HubbubSubscription, dispatch_uid="HubbubDeleted")
+def subscription_changed_handler(sender, **kwargs):
+    HubbubSubscription.clear_verified_subscriptions()
@@ -0,0 +1,143 @@
+"""
+Keyset ("cursor") pagination over posts in ``BloggerPost.Meta.ordering``
+order: newest published first, then newest updated, then post_id. Pages
+are found by comparing against the post at the edge of the current page
+instead of skipping rows with OFFSET, so older pages cost the same to
+load no matter how deep they are.
+"""
+import base64
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+ORDERING = ('-published', '-updated', '-post_id')
+
+# set in request.META to the number of the page the static export is rendering, which links
+# the pages by their exported paths instead of by cursor
+STATIC_PAGE = 'blogger.static_page'
+
+
+def get_static_page(request):
+    return request.META.get(STATIC_PAGE)
+
+
+def get_static_page_url(url, number):
+    """
+    Where the static export writes page ``number`` of the list at ``url``.
+    """
+    return url if number == 1 else '%spage/%d/' % (url, number)
+
+
+def encode_cursor(post):
+    value = u'%s|%s|%s' % (post.published.isoformat(), post.updated.isoformat(), post.post_id)
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns the (published, updated, post_id) of a cursor, raising
+    ValueError when it isn't one of ours.
+    """
+    try:
+        value = base64.urlsafe_b64decode(str(cursor + '=' * (-len(cursor) % 4))).decode('utf-8')
+        published, updated, post_id = value.split(u'|', 2)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor %r' % cursor)
+    published, updated = parse_datetime(published), parse_datetime(updated)
+    if published is None or updated is None:
+        raise ValueError('Invalid cursor %r' % cursor)
+    return published, updated, post_id
+
+
+def older_than(cursor):
+    published, updated, post_id = decode_cursor(cursor)
+    return (
+        Q(published__lt=published) |
+        Q(published=published, updated__lt=updated) |
+        Q(published=published, updated=updated, post_id__lt=post_id)
+    )
+
+
+def newer_than(cursor):
+    published, updated, post_id = decode_cursor(cursor)
+    return (
+        Q(published__gt=published) |
+        Q(published=published, updated__gt=updated) |
+        Q(published=published, updated=updated, post_id__gt=post_id)
+    )
+
+
+class CursorPage(object):
+    """
+    Stands in for a ``Page``, with cursors instead of page numbers.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate(queryset, page_size, after=None, before=None):
+    """
+    Returns the ``CursorPage`` of ``page_size`` posts older than the
+    ``after`` cursor, newer than the ``before`` cursor, or the newest posts
+    when neither is given.
+    """
+    queryset = queryset.order_by(*ORDERING)
+    if before:
+        posts = list(queryset.filter(newer_than(before)).reverse()[:page_size + 1])
+        has_newer = len(posts) > page_size
+        posts = posts[:page_size][::-1]
+        return CursorPage(
+            posts,
+            next_cursor=encode_cursor(posts[-1]) if posts else None,
+            previous_cursor=encode_cursor(posts[0]) if has_newer else None,
+        )
+
+    if after:
+        queryset = queryset.filter(older_than(after))
+    posts = list(queryset[:page_size + 1])
+    has_older = len(posts) > page_size
+    posts = posts[:page_size]
+    return CursorPage(
+        posts,
+        next_cursor=encode_cursor(posts[-1]) if has_older else None,
+        previous_cursor=encode_cursor(posts[0]) if after and posts else None,
+    )
+
+
+class CursorPaginationMixin(object):
+    """
+    Swaps the page number pagination of list views for cursors read from
+    the ``after`` and ``before`` query string parameters. The page is in
+    the context as ``page_obj`` like with regular pagination.
+    """
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            page = paginate(
+                queryset,
+                page_size,
+                after=self.request.GET.get('after'),
+                before=self.request.GET.get('before'),
+            )
+        except ValueError:
+            raise Http404('Invalid page')
+        return (None, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,53 @@
+"""
+Pre-rendered post fragments.
+
+With the 'prerender_posts' option on, ``blogger/post_content.html`` is
+rendered once per post when the post is synced (or by the renderposts
+management command) and stored in ``RenderedPost``, so list and detail
+pages paste the stored html instead of rendering the template for every
+post on every request. A fragment is used only while its version matches
+``get_version()`` and it was rendered from the post's current ``updated``.
+"""
+from hashlib import sha1
+
+from django.template.loader import get_template
+from django.urls import get_script_prefix
+
+from blogger import config
+
+TEMPLATE = 'blogger/post_content.html'
+
+_versions = {}
+
+
+def get_version():
+    """
+    Identifies everything a fragment is rendered from besides the post: the
+    template source, the options it reads, the script prefix its links
+    start with and the 'render_version' option, which can be bumped by hand
+    when something the template includes changes. Worked out once per
+    process and prefix.
+    """
+    prefix = get_script_prefix()
+    if prefix not in _versions:
+        template = get_template(TEMPLATE)
+        source = getattr(getattr(template, 'template', None), 'source', '')
+        key = '%s|%s|%s|%s' % (config.render_version, config.disqus_forum, prefix, source)
+        _versions[prefix] = sha1(key.encode('utf-8')).hexdigest()
+    return _versions[prefix]
+
+
+def clear_version():
+    _versions.clear()
+
+
+def render_fragments(post):
+    """
+    Returns the (list html, detail html) of ``post``. The template only links
+    the title away from the post's own page, which it tells by request.path.
+    """
+    template = get_template(TEMPLATE)
+    context = {'object': post, 'config': config}
+    list_html = template.render(dict(context, request={'path': None}))
+    detail_html = template.render(dict(context, request={'path': post.get_absolute_url()}))
+    return list_html, detail_html
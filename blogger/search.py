@@ -0,0 +1,142 @@
+"""
+Full text search over the mirrored posts.
+
+On PostgreSQL posts carry a GIN indexed ``search_vector`` tsvector column
+and on SQLite they are copied into an FTS5 table. Both are created by the
+``0006_search_index`` migration outside of the model, so the model stays
+usable on every database; anywhere else (or on SQLite built without FTS5)
+searching falls back to scanning the title and plain text.
+
+The index is kept up to date by ``sync_blog_entries`` and by saving or
+deleting single posts.
+"""
+from django.apps import apps
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from blogger import config
+
+FTS_TABLE = 'blogger_bloggerpost_fts'
+
+
+def get_post_table():
+    return apps.get_model('blogger', 'BloggerPost')._meta.db_table
+
+
+class PostgresIndex(object):
+
+    def index(self, cursor, post_ids):
+        cursor.execute(
+            "UPDATE {table} SET search_vector = "
+            "setweight(to_tsvector(%s, coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector(%s, coalesce(plain_text, '')), 'B') "
+            "WHERE post_id = ANY(%s)".format(table=get_post_table()),
+            [config.search_config, config.search_config, list(post_ids)],
+        )
+
+    def remove(self, cursor, post_ids):
+        # the column goes away with the row.
+        pass
+
+    def search(self, cursor, query, limit):
+        cursor.execute(
+            "SELECT post_id FROM {table} WHERE search_vector @@ plainto_tsquery(%s, %s) "
+            "ORDER BY ts_rank(search_vector, plainto_tsquery(%s, %s)) DESC LIMIT %s".format(table=get_post_table()),
+            [config.search_config, query, config.search_config, query, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class SqliteIndex(object):
+
+    def index(self, cursor, post_ids):
+        self.remove(cursor, post_ids)
+        cursor.execute(
+            "INSERT INTO {fts} (post_id, title, body) SELECT post_id, title, plain_text FROM {table} "
+            "WHERE post_id IN ({params})".format(
+                fts=FTS_TABLE, table=get_post_table(), params=', '.join(['%s'] * len(post_ids))
+            ),
+            list(post_ids),
+        )
+
+    def remove(self, cursor, post_ids):
+        cursor.execute(
+            "DELETE FROM {fts} WHERE post_id IN ({params})".format(
+                fts=FTS_TABLE, params=', '.join(['%s'] * len(post_ids))
+            ),
+            list(post_ids),
+        )
+
+    def search(self, cursor, query, limit):
+        # quote every word so nothing in the query is read as FTS5 syntax.
+        match = ' '.join('"%s"' % word.replace('"', '""') for word in query.split())
+        cursor.execute(
+            "SELECT post_id FROM {fts} WHERE {fts} MATCH %s ORDER BY rank LIMIT %s".format(fts=FTS_TABLE),
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+_sqlite_fts = {}
+
+
+def get_index(using):
+    """
+    Returns the search index for the database alias ``using``, or None
+    when there isn't one.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        return PostgresIndex()
+    if connection.vendor == 'sqlite':
+        if using not in _sqlite_fts:
+            _sqlite_fts[using] = FTS_TABLE in connection.introspection.table_names()
+        if _sqlite_fts[using]:
+            return SqliteIndex()
+    return None
+
+
+def index_posts(post_ids, using='default'):
+    post_ids = list(post_ids)
+    index = get_index(using)
+    if index is None or not post_ids:
+        return
+    with connections[using].cursor() as cursor:
+        for start in range(0, len(post_ids), config.sync_batch_size):
+            index.index(cursor, post_ids[start:start + config.sync_batch_size])
+
+
+def remove_posts(post_ids, using='default'):
+    post_ids = list(post_ids)
+    index = get_index(using)
+    if index is None or not post_ids:
+        return
+    with connections[using].cursor() as cursor:
+        index.remove(cursor, post_ids)
+
+
+def search_posts(queryset, query, limit=None):
+    """
+    Narrows ``queryset`` to the posts matching ``query``, best matches
+    first. At most ``limit`` posts are returned when the database has a
+    search index.
+    """
+    query = ' '.join(query.split())
+    if not query:
+        return queryset.none()
+
+    index = get_index(queryset.db)
+    if index is None:
+        for word in query.split():
+            queryset = queryset.filter(Q(title__icontains=word) | Q(plain_text__icontains=word))
+        return queryset
+
+    with connections[queryset.db].cursor() as cursor:
+        post_ids = index.search(cursor, query, limit or config.search_results)
+    if not post_ids:
+        return queryset.none()
+    ranking = Case(
+        *[When(pk=post_id, then=Value(position)) for position, post_id in enumerate(post_ids)],
+        output_field=IntegerField()
+    )
+    return queryset.filter(pk__in=post_ids).annotate(search_rank=ranking).order_by('search_rank')
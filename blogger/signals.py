@@ -0,0 +1,11 @@
+"""
+Signals sent around every sync, see blogger.instrumentation.
+"""
+from django.dispatch import Signal
+
+# sent before a sync starts, with the kind of sync as ``source`` and the feed ``url`` or path when there is one.
+sync_started = Signal(providing_args=['source', 'url'])
+
+# sent once a sync is over, whether it succeeded or not, with its ``SyncStats`` and the
+# ``SyncRun`` it was logged as (None with the 'sync_log' option off).
+sync_finished = Signal(providing_args=['source', 'url', 'stats', 'run'])
@@ -1,18 +1,48 @@
 from django import template
+from django.http import QueryDict
+from django.utils.safestring import mark_safe
 
-from blogger import models
+from blogger import caching, config, models, rendering
+from blogger.pagination import get_static_page, get_static_page_url
 
 register = template.Library()
 
 
+@register.simple_tag
+def get_cache_generation():
+    """
+    Changes every time a sync changes posts, for use as a {% cache %} fragment key.
+    """
+    return caching.get_generation()
+
+
+@register.simple_tag(takes_context=True)
+def render_post(context, post):
+    """
+    Renders blogger/post_content.html for ``post``, pasting its pre-rendered
+    fragment instead when the 'prerender_posts' option is on and it's current.
+    """
+    rendered = post.get_rendered() if config.prerender_posts else None
+    if rendered is not None:
+        request = context.get('request')
+        on_post_page = request is not None and request.path == rendered.absolute_url
+        return mark_safe(rendered.detail_html if on_post_page else rendered.list_html)
+
+    with context.push(object=post):
+        return context.template.engine.get_template(rendering.TEMPLATE).render(context)
+
+
 @register.simple_tag
 def get_recent_posts(cnt=None):
-    return models.BloggerPost.get_latest_posts(cnt)
+    """
+    Whole posts, since templates using the tag may show any of their fields.
+    """
+    return models.BloggerPost.objects.recent(cnt)
 
 
 @register.inclusion_tag('blogger/teaser_snippet.html')
 def render_latest_blog_posts(num):
-    posts = models.BloggerPost.get_latest_posts(num)
+    posts = models.BloggerPost.objects.teasers().recent(num)
     return {
         'blog_posts': posts,
     }
@@ -20,6 +50,40 @@ def render_latest_blog_posts(num):
 
 @register.inclusion_tag('blogger/archive_month_links_snippet.html')
 def render_month_links():
+    months = models.BloggerPost.get_month_index()
     return {
-        'dates': models.BloggerPost.objects.all().dates('published', 'month'),
+        'dates': [month for month, post_count in months],
+        'months': [{'date': month, 'post_count': post_count} for month, post_count in months],
     }
+
+
+@register.inclusion_tag('blogger/cursor_pagination_snippet.html', takes_context=True)
+def render_cursor_pagination(context, page=None):
+    """
+    Newer/older links for a page from blogger.pagination, keeping the rest of the query string.
+    Pages rendered for the static export link to the paths they're exported to instead.
+    """
+    page = page or context.get('page_obj')
+    request = context.get('request')
+    number = get_static_page(request) if request else None
+    if number is not None:
+        links = {}
+        if page and page.has_previous():
+            links['newer_url'] = get_static_page_url(request.path, number - 1)
+        if page and page.has_next():
+            links['older_url'] = get_static_page_url(request.path, number + 1)
+        return links
+
+    params = request.GET.copy() if request else QueryDict(mutable=True)
+    params.pop('after', None)
+    params.pop('before', None)
+
+    links = {}
+    if page and page.has_previous():
+        params['before'] = page.previous_cursor
+        links['newer_url'] = '?' + params.urlencode()
+        del params['before']
+    if page and page.has_next():
+        params['after'] = page.next_cursor
+        links['older_url'] = '?' + params.urlencode()
+    return links
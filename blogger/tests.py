@@ -1,15 +1,27 @@
+from bs4 import BeautifulSoup
+from contextlib import contextmanager
 import datetime
 import feedparser
+import io
 import mock
+import os
 import random
+import shutil
+import tempfile
 
+import django
 from django.conf import settings
-from django.urls import reverse
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection
+from django.urls import reverse, set_script_prefix
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django import template
 
-from blogger import models, config
-from blogger.management.commands import syncblog
+from blogger import caching, export, feeds, models, config, pagination, rendering, search, signals
+from blogger.management.commands import (
+    backfillposts, exportstatic, importfeed, processhubbubqueue, renderposts, syncall, syncblog,
+)
 
 
 def make_blog_post(save=True, **kwargs):
@@ -25,6 +37,20 @@ def make_blog_post(save=True, **kwargs):
     return model
 
 
+@contextmanager
+def committed():
+    """
+    Runs the ``transaction.on_commit`` callbacks registered inside the block,
+    which TestCase's surrounding transaction otherwise holds back for good.
+    """
+    start = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for savepoint_ids, func in callbacks:
+        func()
+
+
 class GeneralModelFuncTests(TestCase):
 
     def setUp(self):
@@ -120,7 +146,7 @@ class GeneralModelFuncTests(TestCase):
             post_id=self.post_id_one,
             title="Old Title",
             published=datetime.datetime.now(),
-            updated=datetime.datetime.now(),
+            updated=datetime.datetime(2011, 7, 1),
             content="Old Post Content",
         )
 
@@ -133,6 +159,123 @@ class GeneralModelFuncTests(TestCase):
         self.assertEqual("Post One", updated_post.title)
         self.assertIn("<h1>This is Post One</h1>", updated_post.content)
 
+    def test_sync_blog_feed_does_not_query_per_entry(self):
+        make_blog_post(post_id=self.post_id_one, title="Old Title", updated=datetime.datetime(2011, 7, 1))
+        feed = feedparser.parse(self.raw_feed)
+
+        # savepoint, batch savepoint, lookup existing ids, taken slugs, bulk insert, bulk update,
+        # two search index writes, release batch savepoint, count the months again, lock their archive
+        # index rows, drop the month post one left, insert the month it moved to in a savepoint,
+        # release savepoint
+        with self.assertNumQueries(16):
+            new_posts = models.sync_blog_feed(feed)
+        self.assertEqual(1, new_posts)
+
+    def test_sync_blog_feed_writes_in_batches(self):
+        make_blog_post(post_id=self.post_id_two, title="Old Title", updated=datetime.datetime(2011, 7, 1))
+
+        new_posts = models.sync_blog_feed(feedparser.parse(self.raw_feed), batch_size=1)
+
+        self.assertEqual(1, new_posts)
+        self.assertEqual(["Post One", "Post Two"], sorted(models.BloggerPost.objects.values_list('title', flat=True)))
+        self.assertEqual(
+            '2011/07/post-two', models.BloggerPost.objects.get(post_id=self.post_id_two).slug
+        )
+
+    def test_sync_blog_entries_retries_a_batch_a_concurrent_sync_inserted_first(self):
+        make_blog_post(post_id=self.post_id_one, title="Old Title", updated=datetime.datetime(2011, 7, 1))
+        feed = feedparser.parse(self.raw_feed)
+        lookups = []
+        objects_filter = models.BloggerPost.objects.filter
+
+        def concurrent_filter(*args, **kwargs):
+            # another sync inserted post one after our first lookup for existing posts ran
+            if 'post_id__in' in kwargs:
+                lookups.append(kwargs['post_id__in'])
+                if len(lookups) == 1:
+                    return models.BloggerPost.objects.none()
+            return objects_filter(*args, **kwargs)
+
+        with mock.patch.object(models.BloggerPost.objects, 'filter', side_effect=concurrent_filter):
+            result = models.sync_blog_entries(feed.entries)
+
+        self.assertEqual(2, len(lookups))
+        self.assertEqual(models.SyncResult(created=1, updated=1), result)
+        self.assertEqual(["Post One", "Post Two"], sorted(models.BloggerPost.objects.values_list('title', flat=True)))
+
+    def test_sync_blog_entries_reports_created_updated_and_unchanged_posts(self):
+        feed = feedparser.parse(self.raw_feed)
+        self.assertEqual(models.SyncResult(created=2), models.sync_blog_entries(feed.entries))
+
+        models.BloggerPost.objects.filter(post_id=self.post_id_two).update(content_hash='stale')
+        self.assertEqual(models.SyncResult(updated=1, unchanged=1), models.sync_blog_entries(feed.entries))
+
+    @mock.patch('blogger.models.get_first_image_url')
+    def test_sync_blog_entries_skips_parsing_unchanged_posts(self, get_first_image_url):
+        get_first_image_url.return_value = ''
+        feed = feedparser.parse(self.raw_feed)
+        models.sync_blog_entries(feed.entries)
+        get_first_image_url.reset_mock()
+
+        with self.assertNumQueries(5):
+            result = models.sync_blog_entries(feed.entries)
+        self.assertEqual(models.SyncResult(unchanged=2), result)
+        self.assertFalse(get_first_image_url.called)
+
+    def test_sync_blog_entries_updates_post_when_feed_updated_time_changes(self):
+        feed = feedparser.parse(self.raw_feed)
+        models.sync_blog_entries(feed.entries)
+        models.BloggerPost.objects.filter(post_id=self.post_id_one).update(updated=datetime.datetime(2000, 1, 1))
+
+        self.assertEqual(models.SyncResult(updated=1, unchanged=1), models.sync_blog_entries(feed.entries))
+
+    def test_from_feed_returns_whether_post_was_created(self):
+        entry = feedparser.parse(self.raw_feed).entries[0]
+        self.assertEqual(True, models.BloggerPost.from_feed(entry))
+        self.assertEqual(False, models.BloggerPost.from_feed(entry))
+
+
+class FirstImageUrlTests(TestCase):
+    """
+    get_first_image_url used to build a whole BeautifulSoup tree; it must
+    still find the same image.
+    """
+    cases = [
+        '',
+        '<p>No images here</p>',
+        '<img src="http://one.jpg"><img src="http://two.jpg">',
+        '<p>text</p><IMG SRC="http://upper.jpg" ALT="x">',
+        '<a href="x"><img alt="first" src="http://nested.jpg" /></a>',
+        '<img src="http://a.jpg?x=1&amp;y=2">',
+        "<img src='http://single-quoted.jpg'>",
+        '<img src=http://unquoted.jpg>',
+        '<!-- <img src="http://commented.jpg"> --><img src="http://real.jpg">',
+        '<script>var s = "<img src=\'http://script.jpg\'>";</script><img src="http://after-script.jpg">',
+        '<p>broken <b>markup <img src="http://broken.jpg"></p>',
+        '<img src="http://dup-one.jpg" src="http://dup-two.jpg">',
+        '<imgur>not an image</imgur><img src="http://after-imgur.jpg">',
+        '<p>&lt;img src="http://escaped.jpg"&gt;</p>',
+    ]
+
+    def get_first_image_url_bs4(self, entry_html):
+        first_image = BeautifulSoup(entry_html, 'html.parser').find('img')
+        return first_image.get('src') if first_image else ""
+
+    def test_matches_beautifulsoup(self):
+        for entry_html in self.cases:
+            self.assertEqual(
+                self.get_first_image_url_bs4(entry_html), models.get_first_image_url(entry_html), entry_html
+            )
+
+    def test_returns_empty_string_for_image_without_src(self):
+        # BeautifulSoup gave None here, which the not null column rejected.
+        self.assertEqual("", models.get_first_image_url('<img alt="no source"><img src="http://later.jpg">'))
+
+    def test_stops_parsing_at_first_image(self):
+        with mock.patch.object(models.FirstImageParser, 'handle_endtag') as handle_endtag:
+            models.get_first_image_url('<img src="http://one.jpg">' + '<p>text</p>' * 10)
+        self.assertFalse(handle_endtag.called)
+
 
 class BloggerPostModelTests(TestCase):
 
@@ -151,6 +294,43 @@ class BloggerPostModelTests(TestCase):
         )
         self.assertEqual('%s/a-blog-post-title' % (now.strftime("%Y/%m")), post.slug)
 
+    def test_gives_posts_with_the_same_title_and_month_their_own_slugs(self):
+        published = datetime.datetime(2011, 7, 24)
+        first = make_blog_post(post_id='1', title="Same Title", published=published)
+        second = make_blog_post(post_id='2', title="Same Title", published=published)
+        third = make_blog_post(post_id='3', title="Same Title", published=published)
+
+        self.assertEqual(['2011/07/same-title', '2011/07/same-title-2', '2011/07/same-title-3'],
+                         [first.slug, second.slug, third.slug])
+        self.assertEqual(second, models.BloggerPost.objects.get(slug=second.slug))
+
+    def test_keeps_slug_on_later_saves_and_changes_it_with_the_title(self):
+        published = datetime.datetime(2011, 7, 24)
+        make_blog_post(post_id='1', title="Same Title", published=published)
+        post = make_blog_post(post_id='2', title="Same Title", published=published)
+
+        post.save()
+        self.assertEqual('2011/07/same-title-2', post.slug)
+
+        post.title = "New Title"
+        post.save()
+        self.assertEqual('2011/07/new-title', post.slug)
+
+    def test_sync_assigns_distinct_slugs_within_a_batch_and_keeps_them(self):
+        published = datetime.datetime(2011, 7, 24)
+        existing = make_blog_post(post_id='0', title="Post One", published=published)
+        entry = """<entry><id>%s</id><title>Post One</title><published>2011-07-24T13:15:30Z</published>
+            <updated>2011-07-24T13:15:30Z</updated><author><name>Aaron</name></author><link rel="self" href="%s" />
+            <content type="html">%s</content></entry>"""
+        feed = "<feed>%s</feed>" % "".join(entry % (n, n, 'content') for n in (1, 2))
+
+        models.sync_blog_feed(feedparser.parse(feed))
+        slugs = dict(models.BloggerPost.objects.values_list('post_id', 'slug'))
+        self.assertEqual({'0': existing.slug, '1': '2011/07/post-one-2', '2': '2011/07/post-one-3'}, slugs)
+
+        models.sync_blog_feed(feedparser.parse(feed.replace('content<', 'changed<')))
+        self.assertEqual(slugs, dict(models.BloggerPost.objects.values_list('post_id', 'slug')))
+
     def test_word_count_returns_word_count_without_tags(self):
         # Note: When two tags but against each other:
         # <p>Hey There.</p><p>This is me</p>
@@ -176,6 +356,19 @@ class BloggerPostModelTests(TestCase):
             post = models.BloggerPost(content="This is a test for remaining word count.")
             self.assertEqual("This is a test for", post.teaser)
 
+    def test_stores_plain_text_word_count_and_teaser_on_save(self):
+        with mock.patch.object(config, 'teaser_length', 2):
+            post = make_blog_post(content='<h1>Hello World</h1> <p>This is a <a href="www.example.com">test</a></p>')
+
+        post = models.BloggerPost.objects.get(pk=post.pk)
+        self.assertEqual('Hello World This is a test', post.plain_text)
+        self.assertEqual(6, post.word_count)
+        self.assertEqual('Hello World', post.teaser_text)
+        with mock.patch('blogger.models.striptags') as striptags:
+            self.assertEqual('Hello World', post.teaser)
+            self.assertEqual(6, post.wordcount)
+        self.assertFalse(striptags.called)
+
     def test_list_content_returns_teaser_when_show_teaser_is_true(self):
         with mock.patch.object(settings, 'BLOGGER_OPTIONS', {'show_teaser': True, 'teaser_length': 5}):
             post = models.BloggerPost(content="This is a test for remaining word count.")
@@ -253,19 +446,236 @@ class BloggerPostModelTests(TestCase):
 
 class SyncBlogManagementTests(TestCase):
 
-    @mock.patch('feedparser.parse')
-    def test_syncs_blog_feed_providing_config_url_on_handle_command(self, parse):
-        with mock.patch('blogger.management.commands.syncblog.sync_blog_feed') as sync_feed:
-            sync_feed.return_value = 1
+    def test_syncs_blog_feed_providing_config_url_on_handle_command(self):
+        with mock.patch('blogger.management.commands.syncblog.crawl_feed') as crawl_feed:
+            crawl_feed.return_value = models.SyncResult(created=1)
             syncblog.Command().handle()
-        parse.assert_called_once_with(config.blogger_feed_url)
-        sync_feed.assert_called_once_with(parse.return_value)
+        crawl_feed.assert_called_once_with(
+            config.blogger_feed_url, since=None, max_results=None, conditional=True, stats=mock.ANY)
+
+    def test_syncs_posts_updated_since_newest_post_when_since_given(self):
+        make_blog_post(updated=datetime.datetime(2012, 1, 1))
+        latest = make_blog_post(updated=datetime.datetime(2012, 2, 1))
+
+        with mock.patch('blogger.management.commands.syncblog.crawl_feed') as crawl_feed:
+            crawl_feed.return_value = models.SyncResult()
+            syncblog.Command().handle(since=True, max_results=50, force=True)
+        crawl_feed.assert_called_once_with(
+            config.blogger_feed_url, since=latest.updated, max_results=50, conditional=False, stats=mock.ANY
+        )
+
+
+class BackfillPostsManagementTests(TestCase):
+
+    def test_recomputes_derived_fields_of_every_post(self):
+        one = make_blog_post(content="One two three")
+        two = make_blog_post(content="Four five")
+        models.BloggerPost.objects.update(plain_text='', word_count=None, teaser_text='')
+
+        with mock.patch.object(config, 'teaser_length', 1):
+            backfillposts.Command().handle(batch_size=1)
+
+        self.assertEqual(
+            [('One two three', 3, 'One'), ('Four five', 2, 'Four')],
+            [
+                models.BloggerPost.objects.values_list('plain_text', 'word_count', 'teaser_text').get(pk=post.pk)
+                for post in (one, two)
+            ],
+        )
+
+
+class CompressedContentTests(TestCase):
+
+    def stored(self, post):
+        return models.BloggerPost.objects.values_list('content', 'content_compressed').get(pk=post.pk)
+
+    @mock.patch.object(config, 'compress_content', True)
+    def test_saves_content_compressed_and_reads_it_back(self):
+        post = make_blog_post(content="<p>Some content</p>\n" * 50)
+        self.assertEqual("<p>Some content</p>\n" * 50, post.content)
+
+        content, compressed = self.stored(post)
+        self.assertEqual('', content)
+        self.assertLess(len(compressed), 100)
+        self.assertEqual("<p>Some content</p>\n" * 50, models.BloggerPost.objects.get(pk=post.pk).content)
+        self.assertEqual(50 * 2, post.word_count)
+
+    @mock.patch.object(config, 'compress_content', True)
+    def test_loads_deferred_content(self):
+        post = make_blog_post(content="Deferred content")
+        linked = models.BloggerPost.objects.links().get(pk=post.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual("Deferred content", linked.content)
+
+    @mock.patch.object(config, 'compress_content', True)
+    def test_syncs_entries_compressed(self):
+        models.sync_blog_feed(make_feed_page(['1', '2']))
+        self.assertEqual(
+            [('', b'Content'), ('', b'Content')],
+            [(content, models.decompress_content(compressed).encode('utf-8'))
+             for content, compressed in models.BloggerPost.objects.values_list('content', 'content_compressed')],
+        )
+        self.assertEqual(['Content', 'Content'], [post.content for post in models.BloggerPost.objects.all()])
+
+    def test_backfill_moves_content_between_columns(self):
+        post = make_blog_post(content="Moved content")
+
+        with mock.patch.object(config, 'compress_content', True):
+            backfillposts.Command().handle()
+        self.assertEqual('', self.stored(post)[0])
+        self.assertEqual("Moved content", models.BloggerPost.objects.get(pk=post.pk).content)
+
+        backfillposts.Command().handle()
+        self.assertEqual(("Moved content", None), self.stored(post))
+
+
+def make_feed_xml(entry_ids, next_url=None):
+    entries = "".join("""
+        <entry>
+            <id>%s</id>
+            <title>Post %s</title>
+            <author><name>Aaron Madison</name></author>
+            <published>2011-07-24T13:15:30.000-07:00</published>
+            <updated>2011-07-24T13:15:30.000-07:00</updated>
+            <content type="html">Content</content>
+            <link rel="alternate" href="example.com/alternate/%s" />
+        </entry>""" % (entry_id, entry_id, entry_id) for entry_id in entry_ids)
+    next_link = '<link rel="next" href="%s" />' % next_url if next_url else ''
+    return """<?xml version='1.0' encoding='UTF-8'?>
+        <feed xmlns="http://www.w3.org/2005/Atom">%s%s</feed>""" % (next_link, entries)
+
+
+def make_feed_page(entry_ids, next_url=None):
+    return feedparser.parse(make_feed_xml(entry_ids, next_url))
+
+
+class FeedCrawlerTests(TestCase):
+
+    def test_build_feed_url_adds_params_to_existing_query_string(self):
+        url = feeds.build_feed_url("http://example.com/feed?alt=atom", **{'max-results': 25, 'orderby': None})
+        self.assertEqual("http://example.com/feed?alt=atom&max-results=25", url)
+
+    def test_build_feed_url_returns_url_unchanged_without_params(self):
+        self.assertEqual("http://example.com/feed", feeds.build_feed_url("http://example.com/feed"))
+
+    def test_crawl_feed_follows_next_links_and_syncs_each_page(self):
+        pages = [
+            make_feed_page(['1', '2'], next_url='http://example.com/feed?start-index=3'),
+            make_feed_page(['3']),
+        ]
+        with mock.patch('feedparser.parse', side_effect=pages) as parse:
+            result = feeds.crawl_feed("http://example.com/feed")
+
+        self.assertEqual(models.SyncResult(created=3), result)
+        self.assertEqual(
+            [mock.call("http://example.com/feed"), mock.call("http://example.com/feed?start-index=3")],
+            parse.call_args_list,
+        )
+
+    def test_crawl_feed_stops_when_next_link_repeats(self):
+        page = make_feed_page(['1'], next_url='http://example.com/feed')
+        with mock.patch('feedparser.parse', return_value=page) as parse:
+            feeds.crawl_feed("http://example.com/feed")
+        self.assertEqual(1, parse.call_count)
+
+    def test_crawl_feed_requests_posts_updated_since_given_time(self):
+        page = make_feed_page([])
+        with mock.patch('feedparser.parse', return_value=page) as parse:
+            feeds.crawl_feed("http://example.com/feed", since=datetime.datetime(2012, 2, 1, 10, 30), max_results=50)
+        parse.assert_called_once_with(
+            "http://example.com/feed?max-results=50&orderby=updated&updated-min=2012-02-01T10%3A30%3A00Z"
+        )
+
+    def test_crawl_feed_stores_validators_of_first_page(self):
+        page = make_feed_page(['1'])
+        page.update(status=200, etag='"abc"', modified='Sun, 24 Jul 2011 20:15:30 GMT')
+        with mock.patch('feedparser.parse', return_value=page):
+            feeds.crawl_feed("http://example.com/feed")
+
+        self.assertEqual(
+            {'etag': '"abc"', 'modified': 'Sun, 24 Jul 2011 20:15:30 GMT'},
+            models.FeedState.get_validators("http://example.com/feed"),
+        )
+
+    def test_crawl_feed_sends_stored_validators_and_stops_when_not_modified(self):
+        models.FeedState.objects.create(url="http://example.com/feed", etag='"abc"')
+        page = make_feed_page([])
+        page.update(status=304)
+        with mock.patch('feedparser.parse', return_value=page) as parse:
+            with mock.patch.object(models, 'sync_blog_entries') as sync_blog_entries:
+                result = feeds.crawl_feed("http://example.com/feed")
+
+        parse.assert_called_once_with("http://example.com/feed", etag='"abc"')
+        self.assertFalse(sync_blog_entries.called)
+        self.assertEqual(models.SyncResult(), result)
+
+    def test_crawl_feed_since_sends_and_stores_last_modified_of_the_base_url(self):
+        models.FeedState.objects.create(
+            url="http://example.com/feed", etag='"abc"', modified='Sun, 24 Jul 2011 20:15:30 GMT')
+        page = make_feed_page(['1'])
+        page.update(status=200, etag='"since"', modified='Mon, 25 Jul 2011 20:15:30 GMT')
+        with mock.patch('feedparser.parse', return_value=page) as parse:
+            feeds.crawl_feed("http://example.com/feed", since=datetime.datetime(2012, 2, 1, 10, 30))
+
+        parse.assert_called_once_with(
+            "http://example.com/feed?orderby=updated&updated-min=2012-02-01T10%3A30%3A00Z",
+            modified='Sun, 24 Jul 2011 20:15:30 GMT',
+        )
+        self.assertEqual(
+            {'etag': '"abc"', 'modified': 'Mon, 25 Jul 2011 20:15:30 GMT'},
+            models.FeedState.get_validators("http://example.com/feed"),
+        )
+
+    def test_crawl_feed_stores_validators_and_location_of_a_redirected_feed(self):
+        page = make_feed_page(['1'])
+        page.update(status=301, href="https://example.com/feed?max-results=5", etag='"abc"')
+        with mock.patch('feedparser.parse', return_value=page):
+            feeds.crawl_feed("http://example.com/feed", max_results=5)
+
+        state = models.FeedState.objects.get(url="http://example.com/feed")
+        self.assertEqual("https://example.com/feed", state.location)
+        self.assertEqual('', state.etag)
+
+        page.update(status=200)
+        with mock.patch('feedparser.parse', return_value=page) as parse:
+            feeds.crawl_feed("http://example.com/feed")
+        parse.assert_called_once_with("https://example.com/feed")
+        self.assertEqual({'etag': '"abc"'}, models.FeedState.get_validators("http://example.com/feed"))
+
+    def test_crawl_feed_stops_when_not_modified_behind_a_redirect(self):
+        models.FeedState.objects.create(url="http://example.com/feed", etag='"abc"')
+        page = feedparser.FeedParserDict(
+            bozo=False, entries=[], feed=feedparser.FeedParserDict(), headers={}, status=302,
+            href="https://example.com/feed",
+        )
+        with mock.patch('feedparser.parse', return_value=page):
+            with mock.patch.object(models, 'sync_blog_entries') as sync_blog_entries:
+                result = feeds.crawl_feed("http://example.com/feed")
+
+        self.assertFalse(sync_blog_entries.called)
+        self.assertEqual(models.SyncResult(), result)
+        self.assertEqual('', models.FeedState.objects.get(url="http://example.com/feed").location)
+
+    def test_crawl_feed_does_not_store_validators_of_failed_fetches(self):
+        page = make_feed_page([])
+        page.update(status=500, etag='"abc"')
+        with mock.patch('feedparser.parse', return_value=page):
+            feeds.crawl_feed("http://example.com/feed")
+        self.assertFalse(models.FeedState.objects.exists())
+
+    def test_crawl_feed_ignores_stored_validators_when_not_conditional(self):
+        models.FeedState.objects.create(url="http://example.com/feed", etag='"abc"')
+        page = make_feed_page([])
+        with mock.patch('feedparser.parse', return_value=page) as parse:
+            feeds.crawl_feed("http://example.com/feed", conditional=False)
+        parse.assert_called_once_with("http://example.com/feed")
 
 
 @mock.patch.object(models.HubbubSubscription, 'send_subscription_request', mock.Mock())
 class PubSubHubbubCallbackHandlerTests(TestCase):
 
     def setUp(self):
+        models.HubbubSubscription.clear_verified_subscriptions()
         self.post_id_one = "tag:blogger.com,1999:blog-11111111"
         self.xml_data = """<?xml version='1.0' encoding='UTF-8'?>
         <feed>
@@ -389,15 +799,60 @@ class PubSubHubbubCallbackHandlerTests(TestCase):
         response = self.client.post(reverse("blogger:hubbub"), data=xml_data, content_type="application/atom+xml")
         self.assertEqual(204, response.status_code)
         self.assertFalse(sync_blog_feed.called)
+        self.assertFalse(models.HubbubDelivery.objects.exists())
 
-    def test_syncs_feed_given_when_subscription_found(self):
+    @mock.patch.object(config, 'hubbub_queue', True)
+    def test_queues_feed_without_syncing_when_subscription_found(self):
+        topic_url = "http://buzz.blogspot.com/feeds/posts/default/"
+        models.HubbubSubscription.objects.create(topic_url=topic_url, is_verified=True)
+
+        response = self.client.post(
+            reverse("blogger:hubbub"), data=self.xml_data, content_type="application/atom+xml"
+        )
+
+        self.assertEqual(204, response.status_code)
+        self.assertEqual(0, models.BloggerPost.objects.all().count())
+        delivery = models.HubbubDelivery.objects.get()
+        self.assertEqual(topic_url, delivery.topic_url)
+        self.assertEqual(self.xml_data.encode(), bytes(delivery.body))
+
+    @mock.patch.object(config, 'hubbub_queue', False)
+    def test_syncs_feed_in_request_when_queue_is_turned_off(self):
+        models.HubbubSubscription.objects.create(
+            topic_url="http://buzz.blogspot.com/feeds/posts/default/", is_verified=True
+        )
+
+        response = self.client.post(
+            reverse("blogger:hubbub"), data=self.xml_data, content_type="application/atom+xml"
+        )
+
+        self.assertEqual(204, response.status_code)
+        self.assertFalse(models.HubbubDelivery.objects.exists())
+        self.assertEqual("Post One", models.BloggerPost.objects.get(pk=self.post_id_one).title)
+
+    def test_ignores_feed_of_unverified_subscription(self):
         models.HubbubSubscription.objects.create(topic_url="http://buzz.blogspot.com/feeds/posts/default/")
 
+        response = self.client.post(
+            reverse("blogger:hubbub"), data=self.xml_data, content_type="application/atom+xml"
+        )
+
+        self.assertEqual(204, response.status_code)
+        self.assertFalse(models.HubbubDelivery.objects.exists())
+
+    @mock.patch.object(config, 'hubbub_queue', True)
+    def test_syncs_feed_given_when_subscription_found(self):
+        models.HubbubSubscription.objects.create(
+            topic_url="http://buzz.blogspot.com/feeds/posts/default/", is_verified=True
+        )
+
         self.assertEqual(0, models.BloggerPost.objects.all().count())
         xml_data = self.xml_data
         response = self.client.post(reverse("blogger:hubbub"), data=xml_data, content_type="application/atom+xml")
+        processhubbubqueue.Command().handle()
 
         self.assertEqual(204, response.status_code)
+        self.assertIsNotNone(models.HubbubDelivery.objects.get().processed)
         models.BloggerPost.objects.get(pk=self.post_id_one)
         post_one = models.BloggerPost.objects.get(post_id=self.post_id_one)
         self.assertEqual(self.post_id_one, post_one.post_id)
@@ -412,6 +867,419 @@ class PubSubHubbubCallbackHandlerTests(TestCase):
         self.assertEqual("example.com/alternate/1", post_one.link_alternate)
 
 
+class SyncFeedsTests(TestCase):
+
+    def setUp(self):
+        self.pages = {
+            "http://example.com/one": make_feed_page(['1', '2']),
+            "http://example.com/two": make_feed_page(['2', '3']),
+        }
+        self.pages["http://example.com/one"].update(status=200, etag='"one"')
+
+    def parse(self, url, **validators):
+        return self.pages[url]
+
+    def test_syncs_each_feed_and_stores_validators(self):
+        with mock.patch('feedparser.parse', side_effect=self.parse):
+            result = feeds.sync_feeds(["http://example.com/one", "http://example.com/two"], workers=2)
+
+        self.assertEqual(3, result.created)
+        self.assertEqual(4, result.total)
+        self.assertEqual({'etag': '"one"'}, models.FeedState.get_validators("http://example.com/one"))
+        self.assertEqual({}, models.FeedState.get_validators("http://example.com/two"))
+
+    def test_skips_feeds_that_have_not_changed(self):
+        models.FeedState.objects.create(url="http://example.com/two", etag='"two"')
+        self.pages["http://example.com/two"] = make_feed_page([])
+        self.pages["http://example.com/two"].update(status=304)
+
+        with mock.patch('feedparser.parse', side_effect=self.parse) as parse:
+            result = feeds.sync_feeds(["http://example.com/one", "http://example.com/two"])
+
+        self.assertEqual(models.SyncResult(created=2), result)
+        self.assertIn(mock.call("http://example.com/two", etag='"two"'), parse.call_args_list)
+
+    def test_fetches_feeds_from_where_they_were_redirected(self):
+        self.pages["http://example.com/one"].update(status=301, href="https://example.com/one")
+        with mock.patch('feedparser.parse', side_effect=self.parse):
+            feeds.sync_feeds(["http://example.com/one"])
+
+        self.pages["https://example.com/one"] = self.pages.pop("http://example.com/one")
+        with mock.patch('feedparser.parse', side_effect=self.parse) as parse:
+            feeds.sync_feeds(["http://example.com/one"])
+        parse.assert_called_once_with("https://example.com/one", etag='"one"')
+
+    @mock.patch.object(models.HubbubSubscription, 'send_subscription_request', mock.Mock())
+    def test_syncall_syncs_every_subscription(self):
+        models.HubbubSubscription.objects.create(topic_url="http://example.com/one")
+        models.HubbubSubscription.objects.create(topic_url="http://example.com/two")
+
+        with mock.patch('blogger.management.commands.syncall.sync_feeds') as sync_feeds:
+            sync_feeds.return_value = models.SyncResult()
+            syncall.Command().handle(workers=8, force=True)
+
+        sync_feeds.assert_called_once_with(
+            ["http://example.com/one", "http://example.com/two"], workers=8, conditional=False, stats=mock.ANY
+        )
+
+    def test_syncall_syncs_blog_feed_without_subscriptions(self):
+        with mock.patch('blogger.management.commands.syncall.sync_feeds') as sync_feeds:
+            sync_feeds.return_value = models.SyncResult()
+            syncall.Command().handle()
+
+        sync_feeds.assert_called_once_with(
+            [config.blogger_feed_url], workers=None, conditional=True, stats=mock.ANY)
+
+
+class ImportFeedTests(TestCase):
+
+    export = b"""<?xml version='1.0' encoding='UTF-8'?>
+        <feed xmlns='http://www.w3.org/2005/Atom' xmlns:app='http://purl.org/atom/app#'>
+            <id>tag:blogger.com,1999:blog-1</id>
+            <entry>
+                <id>tag:blogger.com,1999:blog-1.settings.BLOG_NAME</id>
+                <category scheme='http://schemas.google.com/g/2005#kind'
+                          term='http://schemas.google.com/blogger/2008/kind#settings'/>
+                <content type='text'>My Blog</content>
+            </entry>
+            <entry>
+                <id>tag:blogger.com,1999:blog-1.post-1</id>
+                <published>2011-07-24T13:15:30.000-07:00</published>
+                <updated>2011-07-25T13:15:30.000-07:00</updated>
+                <category scheme='http://schemas.google.com/g/2005#kind'
+                          term='http://schemas.google.com/blogger/2008/kind#post'/>
+                <title type='text'>Post One</title>
+                <content type='html'>&lt;p&gt;Hello &lt;img src="http://one-image.jpg" /&gt;&lt;/p&gt;</content>
+                <link rel='alternate' type='text/html' href='http://example.blogspot.com/post-one.html'/>
+                <author><name>Aaron Madison</name></author>
+            </entry>
+            <entry>
+                <id>tag:blogger.com,1999:blog-1.post-2</id>
+                <published>2011-07-26T13:15:30.000-07:00</published>
+                <updated>2011-07-26T13:15:30.000-07:00</updated>
+                <category scheme='http://schemas.google.com/g/2005#kind'
+                          term='http://schemas.google.com/blogger/2008/kind#post'/>
+                <app:control><app:draft>yes</app:draft></app:control>
+                <title type='text'>Draft</title>
+                <content type='html'>Not yet</content>
+                <author><name>Aaron Madison</name></author>
+            </entry>
+            <entry>
+                <id>tag:blogger.com,1999:blog-1.post-3</id>
+                <published>2011-08-01T13:15:30.000-07:00</published>
+                <updated>2011-08-01T13:15:30.000-07:00</updated>
+                <title type='text'>Post Three</title>
+                <content type='html'>Three</content>
+                <author><name>Aaron Madison</name></author>
+            </entry>
+        </feed>"""
+
+    def test_imports_published_posts_and_skips_everything_else(self):
+        result = feeds.import_feed(io.BytesIO(self.export), batch_size=1)
+
+        self.assertEqual(models.SyncResult(created=2), result)
+        post = models.BloggerPost.objects.get(pk="tag:blogger.com,1999:blog-1.post-1")
+        self.assertEqual("Post One", post.title)
+        self.assertEqual("Aaron Madison", post.author)
+        self.assertEqual('<p>Hello <img src="http://one-image.jpg" /></p>', post.content)
+        self.assertEqual("http://one-image.jpg", post.first_image_url)
+        self.assertEqual("http://example.blogspot.com/post-one.html", post.link_alternate)
+        self.assertEqual("2011/07/post-one", post.slug)
+        self.assertEqual(
+            ["Post One", "Post Three"], sorted(models.BloggerPost.objects.values_list('title', flat=True))
+        )
+
+    def test_imported_entries_match_what_feedparser_produces(self):
+        entry = next(feeds.iter_atom_entries(io.BytesIO(self.export)))
+        parsed = feedparser.parse(self.export).entries[1]
+        self.assertEqual(models.get_entry_digest(parsed), models.get_entry_digest(entry))
+        self.assertEqual(parsed.updated_parsed, entry.updated_parsed)
+
+    def test_command_imports_file(self):
+        with tempfile.NamedTemporaryFile(suffix='.xml') as export:
+            export.write(self.export)
+            export.flush()
+            importfeed.Command().handle(path=export.name)
+        self.assertEqual(2, models.BloggerPost.objects.count())
+
+
+class ExportStaticTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        self.addCleanup(lambda: os.path.exists(self.state_file) and os.remove(self.state_file))
+        self.state_file = export.get_state_file(self.output_dir)
+        self.one = make_blog_post(title="Post One", published=datetime.datetime(2012, 1, 5))
+        self.two = make_blog_post(title="Post Two", published=datetime.datetime(2012, 2, 5))
+
+    def read_page(self, url):
+        with open(export.get_page_file(self.output_dir, url), 'rb') as page:
+            return page.read().decode('utf-8')
+
+    def export(self, **kwargs):
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            exportstatic.Command().handle(output_dir=self.output_dir, workers=1, **kwargs)
+        return stdout.getvalue()
+
+    def test_exports_every_page(self):
+        self.assertEqual('Exported 6 pages (0 removed) to %s\n' % self.output_dir, self.export())
+
+        self.assertIn("Post One", self.read_page(self.one.get_absolute_url()))
+        self.assertIn("Post Two", self.read_page(reverse("blogger:home")))
+        self.assertIn("Post Two", self.read_page(reverse("blogger:archive_year", kwargs={'year': 2012})))
+        self.assertIn("Post One", self.read_page(
+            reverse("blogger:archive_month", kwargs={'year': 2012, 'month': '01'})))
+
+    def test_only_renders_pages_of_changed_posts(self):
+        self.export()
+        self.assertEqual('Exported 0 pages (0 removed) to %s\n' % self.output_dir, self.export())
+
+        self.one.content = "Changed content"
+        self.one.updated = datetime.datetime.now()
+        self.one.save()
+        self.assertEqual('Exported 4 pages (0 removed) to %s\n' % self.output_dir, self.export())
+        self.assertIn("Changed content", self.read_page(self.one.get_absolute_url()))
+
+        self.assertEqual('Exported 6 pages (0 removed) to %s\n' % self.output_dir, self.export(full=True))
+
+    def test_removes_pages_of_deleted_posts(self):
+        self.export()
+        url = self.two.get_absolute_url()
+        with committed():
+            self.two.delete()
+
+        # the post and its now empty month go, and the month links changed on every page left
+        self.assertEqual('Exported 4 pages (2 removed) to %s\n' % self.output_dir, self.export())
+        self.assertFalse(os.path.exists(export.get_page_file(self.output_dir, url)))
+        self.assertNotIn("Post Two", self.read_page(reverse("blogger:home")))
+
+    def test_renders_pages_in_worker_processes(self):
+        with mock.patch('blogger.export.multiprocessing.Pool') as pool:
+            pool.return_value.imap_unordered.side_effect = lambda func, urls: map(func, urls)
+            result = export.export_site(self.output_dir, workers=2)
+        pool.assert_called_once_with(2, initializer=django.setup)
+        self.assertEqual(6, result.rendered)
+
+    def test_keeps_the_state_out_of_the_output_directory(self):
+        with open(os.path.join(self.output_dir, export.STATE_FILE), 'w') as old_state:
+            old_state.write('{}')
+        self.export()
+
+        self.assertTrue(os.path.exists(self.state_file))
+        self.assertNotIn(export.STATE_FILE, os.listdir(self.output_dir))
+
+    @mock.patch.object(config, 'archive_page_size', 1)
+    @mock.patch.object(config, 'recent_post_count', 1)
+    def test_exports_older_pages_to_the_paths_their_links_point_to(self):
+        self.assertEqual('Exported 8 pages (0 removed) to %s\n' % self.output_dir, self.export())
+
+        for url in (reverse("blogger:home"), reverse("blogger:archive_year", kwargs={'year': 2012})):
+            first, second = self.read_page(url), self.read_page(url + 'page/2/')
+            self.assertIn("Post Two", first)
+            self.assertNotIn("Post One", first)
+            self.assertIn('href="%spage/2/"' % url, first)
+            self.assertIn("Post One", second)
+            self.assertIn('href="%s"' % url, second)
+            self.assertNotIn("?after=", first + second)
+        self.assertEqual(
+            self.client.get(reverse("blogger:home")).content.decode('utf-8').count("Post Two"),
+            self.read_page(reverse("blogger:home")).count("Post Two"),
+        )
+
+        with committed():
+            self.one.delete()
+        self.export()
+        self.assertFalse(os.path.exists(export.get_page_file(self.output_dir, reverse("blogger:home") + 'page/2/')))
+
+    def test_renders_every_page_when_the_months_with_posts_change(self):
+        self.export()
+        make_blog_post(title="Post Three", published=datetime.datetime(2012, 2, 20))
+
+        # the new post's pages and every other page, whose month links now count it
+        self.assertEqual('Exported 7 pages (0 removed) to %s\n' % self.output_dir, self.export())
+
+    @mock.patch.object(config, 'cache_pages', True)
+    @mock.patch.object(config, 'recent_post_count', 1)
+    def test_exports_with_cached_pages_for_an_allowed_host(self):
+        with self.settings(ALLOWED_HOSTS=['.example.com']):
+            self.assertEqual('Exported 7 pages (0 removed) to %s\n' % self.output_dir, self.export())
+        # the exported pages, linked by their static paths, aren't cached for visitors
+        home = self.client.get(reverse("blogger:home")).content.decode('utf-8')
+        self.assertIn("?after=", home)
+        self.assertNotIn("page/2/", home)
+
+
+class SyncInstrumentationTests(TestCase):
+
+    def setUp(self):
+        self.finished = []
+        signals.sync_finished.connect(self.sync_finished)
+        self.addCleanup(signals.sync_finished.disconnect, self.sync_finished)
+
+    def sync_finished(self, sender, **kwargs):
+        self.finished.append(kwargs)
+
+    def test_logs_crawls_with_stage_timings_and_counts(self):
+        page = make_feed_page(['1', '2'])
+        page.update(status=200, headers={'content-length': '1234'})
+        with mock.patch('feedparser.parse', return_value=page):
+            feeds.crawl_feed("http://example.com/feed")
+
+        run = models.SyncRun.objects.get()
+        self.assertEqual(
+            ('crawl', "http://example.com/feed", True, 2, 2, 0, 1234),
+            (run.source, run.url, run.succeeded, run.entries, run.created, run.updated, run.bytes_downloaded),
+        )
+        self.assertTrue(all(
+            seconds >= 0 for seconds in (run.fetch_seconds, run.extract_seconds, run.write_seconds, run.duration)))
+        self.assertEqual(run, self.finished[0]['run'])
+        self.assertEqual(2, self.finished[0]['stats'].created)
+
+    def test_logs_failed_syncs_with_their_traceback(self):
+        with mock.patch('feedparser.parse', side_effect=ValueError("bad feed")):
+            self.assertRaises(ValueError, feeds.crawl_feed, "http://example.com/feed")
+
+        run = models.SyncRun.objects.get()
+        self.assertFalse(run.succeeded)
+        self.assertIn("ValueError: bad feed", run.error)
+
+    def test_logs_feeds_that_could_not_be_fetched_as_failed(self):
+        page = feedparser.FeedParserDict(
+            bozo=True, bozo_exception=IOError("connection refused"), entries=[], feed=feedparser.FeedParserDict())
+        with mock.patch('feedparser.parse', return_value=page):
+            feeds.crawl_feed("http://example.com/feed")
+        error_page = make_feed_page([])
+        error_page.update(status=503, href="http://example.com/two")
+        with mock.patch('feedparser.parse', return_value=error_page):
+            feeds.sync_feeds(["http://example.com/two"])
+
+        crawl, sync = models.SyncRun.objects.order_by('pk')
+        self.assertFalse(crawl.succeeded)
+        self.assertTrue(crawl.error.startswith("Fetching http://example.com/feed failed: no response, "))
+        self.assertIn("connection refused", crawl.error)
+        self.assertFalse(sync.succeeded)
+        self.assertEqual("Fetching http://example.com/two failed: HTTP 503", sync.error)
+
+    @mock.patch.object(config, 'sync_log_keep_days', 30)
+    def test_deletes_runs_older_than_sync_log_keep_days(self):
+        old = models.SyncRun.objects.create(
+            source='crawl', started=datetime.datetime.now() - datetime.timedelta(days=31))
+        recent = models.SyncRun.objects.create(
+            source='crawl', started=datetime.datetime.now() - datetime.timedelta(days=29))
+
+        feeds.import_feed(io.BytesIO(make_feed_xml(['1']).encode()))
+
+        self.assertFalse(models.SyncRun.objects.filter(pk=old.pk).exists())
+        self.assertTrue(models.SyncRun.objects.filter(pk=recent.pk).exists())
+
+    def test_logs_hubbub_queue_runs_with_parse_time_only_when_there_is_work(self):
+        feeds.process_hubbub_queue()
+        self.assertFalse(models.SyncRun.objects.exists())
+
+        body = make_feed_xml(['1']).encode()
+        models.HubbubDelivery.objects.create(topic_url="http://example.com/feed", body=body)
+        feeds.process_hubbub_queue()
+        run = models.SyncRun.objects.get()
+        self.assertEqual(('queue', 1, len(body)), (run.source, run.created, run.bytes_downloaded))
+
+    def test_imports_count_parsing(self):
+        stats = models.SyncStats()
+        feeds.import_feed(io.BytesIO(make_feed_xml(['1', '2']).encode()), stats=stats)
+        self.assertEqual(2, stats.created)
+        self.assertGreater(stats.timings['parse'], 0)
+        self.assertEqual('import', models.SyncRun.objects.get().source)
+
+    @mock.patch.object(config, 'sync_log', False)
+    def test_sends_signals_without_logging_when_sync_log_is_off(self):
+        models.sync_blog_feed(make_feed_page(['1']))
+        with mock.patch('feedparser.parse', return_value=make_feed_page(['1'])):
+            feeds.sync_feeds(["http://example.com/feed"])
+        self.assertFalse(models.SyncRun.objects.exists())
+        self.assertEqual([('feeds', None)], [(kwargs['source'], kwargs['run']) for kwargs in self.finished])
+
+
+class SyncRunAdminTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        self.run = models.SyncRun.objects.create(source='crawl', started=datetime.datetime.now())
+
+    def test_sync_log_can_be_viewed_but_not_changed(self):
+        change_url = reverse('admin:blogger_syncrun_change', args=[self.run.pk])
+
+        self.assertEqual(200, self.client.get(reverse('admin:blogger_syncrun_changelist')).status_code)
+        self.assertEqual(200, self.client.get(change_url).status_code)
+        self.assertEqual(403, self.client.post(change_url, {'source': 'changed'}).status_code)
+        self.assertEqual('crawl', models.SyncRun.objects.get().source)
+
+
+class ProcessHubbubQueueTests(TestCase):
+
+    def test_syncs_pending_deliveries_and_marks_them_processed(self):
+        first = models.HubbubDelivery.objects.create(
+            topic_url="http://example.com/feed", body=make_feed_xml(['1', '2']).encode()
+        )
+        second = models.HubbubDelivery.objects.create(
+            topic_url="http://example.com/feed", body=make_feed_xml(['2', '3']).encode()
+        )
+
+        result = feeds.process_hubbub_queue()
+
+        self.assertEqual(models.SyncResult(created=3, unchanged=1), result)
+        for delivery in (first, second):
+            delivery.refresh_from_db()
+            self.assertIsNotNone(delivery.processed)
+            self.assertEqual(1, delivery.attempts)
+        self.assertEqual(models.SyncResult(), feeds.process_hubbub_queue())
+
+    def test_late_deliveries_of_older_entries_do_not_overwrite_newer_posts(self):
+        older = make_feed_xml(['1'])
+        newer = older.replace('T13:15:30.000-07:00</updated>', 'T14:15:30.000-07:00</updated>').replace(
+            'Content</content>', 'Newer content</content>')
+        # the newer delivery gets applied first, e.g. after the older one failed and was retried
+        for body in (newer, older):
+            models.HubbubDelivery.objects.create(topic_url="http://example.com/feed", body=body.encode())
+
+        result = feeds.process_hubbub_queue()
+
+        self.assertEqual(models.SyncResult(created=1, unchanged=1), result)
+        self.assertEqual("Newer content", models.BloggerPost.objects.get(pk='1').content)
+
+    def test_keeps_error_and_retries_failed_deliveries_up_to_max_attempts(self):
+        delivery = models.HubbubDelivery.objects.create(
+            topic_url="http://example.com/feed", body=make_feed_xml(['1']).encode()
+        )
+
+        with mock.patch.object(config, 'hubbub_max_attempts', 2):
+            with mock.patch.object(models, 'sync_blog_entries', side_effect=ValueError("bad feed")):
+                with mock.patch('blogger.feeds.logging'):
+                    feeds.process_hubbub_queue()
+                    feeds.process_hubbub_queue()
+                    feeds.process_hubbub_queue()
+
+        delivery.refresh_from_db()
+        self.assertIsNone(delivery.processed)
+        self.assertEqual(2, delivery.attempts)
+        self.assertIn("ValueError: bad feed", delivery.error)
+
+    def test_command_deletes_old_processed_deliveries(self):
+        old = models.HubbubDelivery.objects.create(
+            topic_url="http://example.com/feed", body=b'',
+            processed=datetime.datetime.now() - datetime.timedelta(days=8),
+        )
+        recent = models.HubbubDelivery.objects.create(
+            topic_url="http://example.com/feed", body=b'', processed=datetime.datetime.now(),
+        )
+
+        processhubbubqueue.Command().handle(keep_days=7)
+
+        self.assertEqual([recent.pk], list(models.HubbubDelivery.objects.values_list('pk', flat=True)))
+        self.assertFalse(models.HubbubDelivery.objects.filter(pk=old.pk).exists())
+
+
 class HubbubSubscriptionModelTests(TestCase):
 
     @mock.patch.object(models.HubbubSubscription, 'send_subscription_request', mock.Mock())
@@ -427,6 +1295,32 @@ class HubbubSubscriptionModelTests(TestCase):
         )
         self.assertEqual(verify_token, subscription.verify_token)
 
+    @mock.patch.object(models.HubbubSubscription, 'send_subscription_request', mock.Mock())
+    def test_get_by_url_list_returns_all_verified_subscriptions_in_list(self):
+        models.HubbubSubscription.clear_verified_subscriptions()
+        one = models.HubbubSubscription.objects.create(topic_url="http://www.example.com/1", is_verified=True)
+        two = models.HubbubSubscription.objects.create(topic_url="http://www.example.com/2", is_verified=True)
+        models.HubbubSubscription.objects.create(topic_url="http://www.example.com/3")
+
+        url_list = ["http://www.example.com/2", "http://www.example.com/3", "http://www.example.com/1"]
+        self.assertEqual([two, one], models.HubbubSubscription.get_by_url_list(url_list))
+        self.assertEqual([], models.HubbubSubscription.get_by_url_list(["http://www.example.com/4"]))
+
+    @mock.patch.object(models.HubbubSubscription, 'send_subscription_request', mock.Mock())
+    def test_get_by_url_list_does_not_query_until_subscriptions_change(self):
+        models.HubbubSubscription.clear_verified_subscriptions()
+        models.HubbubSubscription.get_by_url_list([])
+
+        with self.assertNumQueries(0):
+            self.assertEqual([], models.HubbubSubscription.get_by_url_list(["http://www.example.com"]))
+
+        subscription = models.HubbubSubscription.objects.create(topic_url="http://www.example.com", is_verified=True)
+        self.assertEqual([subscription], models.HubbubSubscription.get_by_url_list(["http://www.example.com"]))
+
+        with mock.patch.object(models.HubbubSubscription, 'send_subscription_request'):
+            subscription.delete()
+        self.assertEqual([], models.HubbubSubscription.get_by_url_list(["http://www.example.com"]))
+
     @mock.patch.object(models.HubbubSubscription, 'send_subscription_request')
     def test_sends_subscription_request_when_new_model_created(self, send_request):
         m = models.HubbubSubscription(topic_url="http://www.example.com")
@@ -460,6 +1354,456 @@ class PostListViewTests(TestCase):
         self.assertEqual(settings.DEBUG, response.context['dev_mode'])
 
 
+@mock.patch.object(config, 'prerender_posts', True)
+class PrerenderedPostTests(TestCase):
+
+    def setUp(self):
+        rendering.clear_version()
+        # the class decorator doesn't cover setUp
+        with mock.patch.object(config, 'prerender_posts', True):
+            self.post = make_blog_post(title="Post One", content="<p>Rendered once</p>")
+
+    def test_renders_posts_when_saved(self):
+        rendered = models.RenderedPost.objects.get(post=self.post)
+        self.assertEqual(self.post.get_absolute_url(), rendered.absolute_url)
+        self.assertIn('href="%s">Post One' % self.post.get_absolute_url(), rendered.list_html)
+        self.assertNotIn('href="%s">Post One' % self.post.get_absolute_url(), rendered.detail_html)
+        self.assertIn("<p>Rendered once</p>", rendered.detail_html)
+
+    def test_pages_paste_current_fragments(self):
+        models.RenderedPost.objects.update(list_html="stored list html", detail_html="stored detail html")
+
+        # the freshness aggregate and the posts joined to their fragments
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("blogger:home"))
+        self.assertContains(response, "stored list html")
+        self.assertContains(self.client.get(self.post.get_absolute_url()), "stored detail html")
+
+    def test_falls_back_to_the_template_when_fragments_are_stale(self):
+        models.RenderedPost.objects.update(list_html="stored list html", post_updated=datetime.datetime(2001, 1, 1))
+        response = self.client.get(reverse("blogger:home"))
+        self.assertNotContains(response, "stored list html")
+        self.assertContains(response, "<p>Rendered once</p>")
+
+        with mock.patch.object(config, 'render_version', 2):
+            rendering.clear_version()
+            self.assertIsNone(models.BloggerPost.objects.select_related('rendered').get().get_rendered())
+
+    def test_ignores_fragments_rendered_under_another_script_prefix(self):
+        models.RenderedPost.objects.update(list_html="stored list html")
+        url = self.post.get_absolute_url()
+        set_script_prefix('/blog/')
+        self.addCleanup(set_script_prefix, '/')
+
+        self.assertIsNone(models.BloggerPost.objects.select_related('rendered').get().get_rendered())
+        models.render_posts()
+        rendered = models.RenderedPost.objects.get(post=self.post)
+        self.assertEqual('/blog' + url, rendered.absolute_url)
+        self.assertIn('href="/blog%s">Post One' % url, rendered.list_html)
+
+    def test_sync_renders_changed_posts(self):
+        models.sync_blog_entries(make_feed_page(['1', '2']).entries)
+        self.assertEqual(
+            set([self.post.pk, '1', '2']), set(models.RenderedPost.objects.values_list('post', flat=True)),
+        )
+
+    def test_command_renders_only_out_of_date_posts(self):
+        other = make_blog_post(title="Post Two")
+        models.RenderedPost.objects.filter(post=other).update(post_updated=datetime.datetime(2001, 1, 1))
+        models.RenderedPost.objects.filter(post=self.post).update(list_html="stored list html")
+
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            renderposts.Command().handle()
+        self.assertEqual('Rendered 1 posts\n', stdout.getvalue())
+        self.assertEqual("stored list html", models.RenderedPost.objects.get(post=self.post).list_html)
+
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            renderposts.Command().handle(all=True)
+        self.assertNotEqual("stored list html", models.RenderedPost.objects.get(post=self.post).list_html)
+
+    def test_saving_drops_fragments_when_not_prerendering(self):
+        with mock.patch.object(config, 'prerender_posts', False):
+            self.post.save()
+        self.assertFalse(models.RenderedPost.objects.exists())
+
+    def test_reverses_absolute_url_once_per_slug(self):
+        with mock.patch('blogger.models.reverse', return_value='/post/') as reverse_url:
+            self.post.get_absolute_url()
+            self.post.get_absolute_url()
+            self.post.slug = 'other'
+            self.post.get_absolute_url()
+        self.assertEqual(2, reverse_url.call_count)
+
+
+@mock.patch.object(config, 'cache_pages', True)
+class CachedPageTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.post = make_blog_post(title="Post One", published=datetime.datetime(2012, 1, 5))
+
+    def test_serves_pages_from_cache_until_sync_changes_posts(self):
+        url = reverse("blogger:archive_year", kwargs={'year': 2012})
+        first = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(first.content, cached.content)
+        self.assertEqual(first['Content-Type'], cached['Content-Type'])
+
+        with committed():
+            models.sync_blog_entries(make_feed_page(['1']).entries)
+        models.BloggerPost.objects.filter(pk='1').update(published=datetime.datetime(2012, 2, 1))
+        self.assertContains(self.client.get(url), "Post 1")
+
+    def test_caches_each_url_separately(self):
+        self.assertContains(self.client.get(self.post.get_absolute_url()), "Post One")
+        self.assertContains(self.client.get(reverse("blogger:archive_year", kwargs={'year': 2012})), "Post One")
+        self.assertEqual(404, self.client.get(reverse("blogger:archive_year", kwargs={'year': 2013})).status_code)
+
+    def test_does_not_cache_pages_that_are_not_found(self):
+        url = reverse("blogger:post", kwargs={'slug': '2012/01/missing'})
+        self.assertEqual(404, self.client.get(url).status_code)
+        make_blog_post(title="Missing", published=datetime.datetime(2012, 1, 5))
+        self.assertEqual(200, self.client.get(url).status_code)
+
+    def test_cache_generation_changes_when_posts_change(self):
+        generation = caching.get_generation()
+        with committed():
+            models.sync_blog_entries(make_feed_page(['1']).entries)
+            # pages rendered before the sync commits mustn't be cached as current
+            self.assertEqual(generation, caching.get_generation())
+        self.assertNotEqual(generation, caching.get_generation())
+
+
+class CursorPaginationTests(TestCase):
+
+    def setUp(self):
+        published = datetime.datetime(2012, 1, 1)
+        # several posts share published and updated times so the post_id tie breaker matters
+        self.posts = [
+            make_blog_post(
+                post_id='post-%d' % i,
+                published=published + datetime.timedelta(days=i // 3),
+                updated=published + datetime.timedelta(days=i // 6),
+            )
+            for i in range(8)
+        ]
+        self.ordered = list(models.BloggerPost.objects.all())
+
+    def test_ordering_matches_model_ordering(self):
+        self.assertEqual(models.BloggerPost._meta.ordering, pagination.ORDERING)
+
+    def test_walks_every_post_older_then_newer(self):
+        queryset = models.BloggerPost.objects.all()
+        pages = [pagination.paginate(queryset, 3)]
+        while pages[-1].has_next():
+            pages.append(pagination.paginate(queryset, 3, after=pages[-1].next_cursor))
+
+        self.assertEqual(self.ordered, [post for page in pages for post in page])
+        self.assertEqual([3, 3, 2], [len(page) for page in pages])
+        self.assertFalse(pages[0].has_previous())
+
+        newer = pagination.paginate(queryset, 3, before=pages[-1].previous_cursor)
+        self.assertEqual(pages[1].object_list, newer.object_list)
+        newest = pagination.paginate(queryset, 3, before=newer.previous_cursor)
+        self.assertEqual(pages[0].object_list, newest.object_list)
+        self.assertFalse(newest.has_previous())
+
+    def test_rejects_invalid_cursors(self):
+        for cursor in ('garbage', 'Zm9v', '!!!'):
+            self.assertRaises(ValueError, pagination.decode_cursor, cursor)
+
+    def test_post_list_links_to_older_posts(self):
+        with mock.patch.object(config, 'recent_post_count', 5):
+            response = self.client.get(reverse("blogger:home"))
+            self.assertEqual(self.ordered[:5], list(response.context['object_list']))
+            self.assertNotContains(response, 'Newer posts')
+
+            page = response.context['page_obj']
+            self.assertContains(response, '?after=%s' % page.next_cursor)
+            # the freshness aggregate and the page itself
+            with self.assertNumQueries(2):
+                older = self.client.get(reverse("blogger:home"), {'after': page.next_cursor})
+            self.assertEqual(self.ordered[5:], list(older.context['object_list']))
+            self.assertContains(older, 'Newer posts')
+            self.assertNotContains(older, 'Older posts')
+
+    def test_archives_are_paginated(self):
+        with mock.patch.object(config, 'archive_page_size', 5):
+            response = self.client.get(reverse("blogger:archive_year", kwargs={'year': 2012}))
+            self.assertEqual(self.ordered[:5], list(response.context['object_list']))
+
+            older = self.client.get(
+                reverse("blogger:archive_year", kwargs={'year': 2012}),
+                {'after': response.context['page_obj'].next_cursor},
+            )
+            self.assertEqual(self.ordered[5:], list(older.context['object_list']))
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(404, self.client.get(reverse("blogger:home"), {'after': 'garbage'}).status_code)
+
+
+class ArchiveViewTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.one = make_blog_post(title="Post One", published=datetime.datetime(2012, 1, 5), content="x" * 1000)
+        self.two = make_blog_post(title="Post Two", published=datetime.datetime(2012, 1, 20), content="x" * 1000)
+
+    def test_month_archive_lists_posts_without_loading_content(self):
+        # the archive index and one page of posts, none of them per post
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("blogger:archive_month", kwargs={'year': 2012, 'month': '01'}))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([self.two, self.one], list(response.context['object_list']))
+        self.assertIn('content', response.context['object_list'][0].get_deferred_fields())
+        self.assertContains(response, self.one.get_absolute_url())
+
+    def test_year_archive_lists_posts_without_loading_content(self):
+        response = self.client.get(reverse("blogger:archive_year", kwargs={'year': 2012}))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([self.two, self.one], list(response.context['object_list']))
+        self.assertIn('content', response.context['object_list'][0].get_deferred_fields())
+        self.assertContains(response, "Post Two")
+
+
+class ArchiveIndexTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.one = make_blog_post(title="Post One", published=datetime.datetime(2012, 1, 5))
+        self.two = make_blog_post(title="Post Two", published=datetime.datetime(2012, 1, 20))
+        self.three = make_blog_post(title="Post Three", published=datetime.datetime(2012, 3, 1))
+
+    def get_index(self):
+        return list(models.ArchiveIndex.objects.values_list('year', 'month', 'post_count'))
+
+    def test_counts_posts_saved_one_at_a_time(self):
+        january = models.ArchiveIndex.objects.get(year=2012, month=1)
+
+        self.assertEqual([(2012, 1, 2), (2012, 3, 1)], self.get_index())
+        self.assertEqual(datetime.datetime(2012, 1, 5), january.first_published)
+        self.assertEqual(datetime.datetime(2012, 1, 20), january.last_published)
+
+    def test_moves_posts_whose_month_changes_and_drops_empty_months(self):
+        three = models.BloggerPost.objects.get(pk=self.three.pk)
+        three.published = datetime.datetime(2012, 1, 25)
+        three.save()
+        self.assertEqual([(2012, 1, 3)], self.get_index())
+
+        self.one.delete()
+        self.assertEqual([(2012, 1, 2)], self.get_index())
+
+    def test_sync_updates_the_months_it_touches(self):
+        models.sync_blog_entries(make_feed_page(['1', '2']).entries)
+
+        self.assertEqual([(2011, 7, 2), (2012, 1, 2), (2012, 3, 1)], self.get_index())
+
+    def test_updates_the_rows_of_months_in_place(self):
+        january = models.ArchiveIndex.objects.get(year=2012, month=1)
+        make_blog_post(title="Post Four", published=datetime.datetime(2012, 1, 25))
+
+        self.assertEqual(3, models.ArchiveIndex.objects.get(pk=january.pk).post_count)
+
+    def test_upserts_months_a_concurrent_sync_inserted_first(self):
+        make_blog_post(title="Post Four", published=datetime.datetime(2012, 5, 1))
+        models.ArchiveIndex.objects.filter(year=2012, month=5).delete()
+
+        with mock.patch.object(models.ArchiveIndex.objects, 'bulk_create', side_effect=IntegrityError):
+            models.update_archive_index()
+
+        self.assertEqual([(2012, 1, 2), (2012, 3, 1), (2012, 5, 1)], self.get_index())
+
+    def test_rebuilds_the_whole_index(self):
+        models.ArchiveIndex.objects.all().delete()
+        models.update_archive_index()
+
+        self.assertEqual([(2012, 1, 2), (2012, 3, 1)], self.get_index())
+
+    def test_archive_pages_link_months_and_years_from_the_index(self):
+        make_blog_post(published=datetime.datetime(2010, 6, 1))
+        month = self.client.get(reverse("blogger:archive_month", kwargs={'year': 2012, 'month': '01'}))
+        year = self.client.get(reverse("blogger:archive_year", kwargs={'year': 2012}))
+
+        self.assertEqual(datetime.date(2012, 3, 1), month.context['next_month'])
+        self.assertEqual(datetime.date(2010, 6, 1), month.context['previous_month'])
+        self.assertEqual(
+            [datetime.datetime(2012, 1, 1), datetime.datetime(2012, 3, 1)], list(year.context['date_list']))
+        self.assertEqual(None, year.context['next_year'])
+        self.assertEqual(datetime.date(2010, 1, 1), year.context['previous_year'])
+
+    def test_archives_without_posts_are_missing(self):
+        empty_month = reverse("blogger:archive_month", kwargs={'year': 2012, 'month': '02'})
+        self.assertEqual(404, self.client.get(empty_month).status_code)
+        self.assertEqual(404, self.client.get(reverse("blogger:archive_year", kwargs={'year': 2011})).status_code)
+
+    def test_archives_of_future_posts_are_missing(self):
+        future = datetime.datetime.now() + datetime.timedelta(days=400)
+        make_blog_post(published=future)
+        future_month = reverse("blogger:archive_month", kwargs={'year': future.year, 'month': future.strftime('%m')})
+
+        self.assertEqual(404, self.client.get(future_month).status_code)
+        future_year = reverse("blogger:archive_year", kwargs={'year': future.year})
+        self.assertEqual(404, self.client.get(future_year).status_code)
+        month = self.client.get(reverse("blogger:archive_month", kwargs={'year': 2012, 'month': '03'}))
+        self.assertEqual(None, month.context['next_month'])
+
+
+class ConditionalResponseTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        rendering.clear_version()
+        self.one = make_blog_post(title="Post One", published=datetime.datetime(2012, 1, 5))
+        self.two = make_blog_post(title="Post Two", published=datetime.datetime(2012, 2, 5))
+        self.urls = [
+            reverse("blogger:home"),
+            self.one.get_absolute_url(),
+            reverse("blogger:archive_year", kwargs={'year': 2012}),
+            reverse("blogger:archive_month", kwargs={'year': 2012, 'month': '01'}),
+        ]
+
+    def test_revalidates_every_page_with_one_query(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(200, response.status_code)
+
+            caching.get_cache().clear()
+            with self.assertNumQueries(1):
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(304, not_modified.status_code)
+            self.assertEqual(response['ETag'], not_modified['ETag'])
+
+            by_date = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(304, by_date.status_code)
+
+    def test_etag_follows_the_posts_on_the_page(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+
+        self.two.updated = datetime.datetime.now() + datetime.timedelta(days=1)
+        with committed():
+            self.two.save()
+        # the home page and the year show post two, the first post and its month don't
+        self.assertEqual(
+            [False, True, False, True],
+            [self.client.get(url)['ETag'] == etag for url, etag in zip(self.urls, etags)],
+        )
+
+    def test_etag_follows_the_template_version(self):
+        etag = self.client.get(self.urls[0])['ETag']
+        with mock.patch.object(config, 'render_version', 2):
+            rendering.clear_version()
+            self.assertEqual(200, self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag).status_code)
+
+    def test_leaves_missing_pages_alone(self):
+        self.assertEqual(404, self.client.get(reverse("blogger:post", kwargs={'slug': 'missing'})).status_code)
+        bad_month = reverse("blogger:archive_month", kwargs={'year': 2012, 'month': '13'})
+        self.assertEqual(404, self.client.get(bad_month).status_code)
+
+    @mock.patch.object(config, 'cache_pages', True)
+    def test_cached_pages_revalidate_without_queries(self):
+        caching.get_cache().clear()
+        etag = self.client.get(self.urls[0])['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(304, self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag).status_code)
+
+
+class PostFeedTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.post = make_blog_post(
+            title="Post One", content="<p>Feed content</p>", published=datetime.datetime(2012, 1, 5))
+
+    def test_serves_atom_feed_of_recent_posts(self):
+        make_blog_post(title="Post Two", published=datetime.datetime(2012, 1, 6))
+        with mock.patch.object(config, 'recent_post_count', 1):
+            response = self.client.get(reverse("blogger:feed"))
+
+        self.assertEqual('application/atom+xml; charset=utf-8', response['Content-Type'])
+        feed = feedparser.parse(response.content)
+        self.assertEqual(["Post Two"], [entry.title for entry in feed.entries])
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+
+    def test_serves_feed_from_cache_until_sync_changes_posts(self):
+        first = self.client.get(reverse("blogger:feed"))
+        self.assertIn("Feed content", feedparser.parse(first.content).entries[0].summary)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse("blogger:feed"))
+        self.assertEqual(first.content, cached.content)
+
+        with committed():
+            models.sync_blog_entries(make_feed_page(['1']).entries)
+        changed = self.client.get(reverse("blogger:feed"))
+        self.assertIn("Post 1", [entry.title for entry in feedparser.parse(changed.content).entries])
+        self.assertNotEqual(first['ETag'], changed['ETag'])
+
+    def test_answers_conditional_requests_with_not_modified(self):
+        etag = self.client.get(reverse("blogger:feed"))['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("blogger:feed"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.content)
+
+        with committed():
+            self.post.delete()
+        self.assertEqual(200, self.client.get(reverse("blogger:feed"), HTTP_IF_NONE_MATCH=etag).status_code)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.cats = make_blog_post(title="All about cats", content="<p>Cats sleep a lot.</p>")
+        self.dogs = make_blog_post(title="Dogs", content="<p>Dogs chase <b>cats</b> around.</p>")
+
+    def test_search_index_is_available(self):
+        self.assertIsNotNone(search.get_index('default'))
+
+    def test_finds_posts_by_title_and_text_with_title_matches_first(self):
+        self.assertEqual([self.cats, self.dogs], list(models.BloggerPost.objects.search("cats")))
+        self.assertEqual([self.dogs], list(models.BloggerPost.objects.search("chase cats")))
+        self.assertEqual([], list(models.BloggerPost.objects.search("birds")))
+
+    def test_indexes_posts_written_by_sync(self):
+        models.sync_blog_entries(make_feed_page(['1']).entries)
+        self.assertEqual(['1'], [post.pk for post in models.BloggerPost.objects.search("content")])
+
+        models.BloggerPost.objects.filter(pk='1').update(content_hash='stale')
+        models.sync_blog_entries(make_feed_page(['1']).entries)
+        self.assertEqual(['1'], [post.pk for post in models.BloggerPost.objects.search("content")])
+
+    def test_reindexes_changed_posts_and_drops_deleted_ones(self):
+        self.dogs.content = "<p>Dogs chase balls.</p>"
+        self.dogs.save()
+        self.assertEqual([self.cats], list(models.BloggerPost.objects.search("cats")))
+
+        self.cats.delete()
+        self.assertEqual([], list(models.BloggerPost.objects.search("cats")))
+
+    def test_treats_search_syntax_as_plain_words(self):
+        self.assertEqual([], list(models.BloggerPost.objects.search('cats" OR NOT (*')))
+        self.assertEqual([], list(models.BloggerPost.objects.search('   ')))
+
+    def test_falls_back_to_scanning_without_search_index(self):
+        with mock.patch.object(search, 'get_index', return_value=None):
+            self.assertEqual({self.cats, self.dogs}, set(models.BloggerPost.objects.search("cats")))
+            self.assertEqual([self.dogs], list(models.BloggerPost.objects.search("chase cats")))
+
+    def test_search_view_lists_matching_posts(self):
+        response = self.client.get(reverse("blogger:search"), {'q': 'chase'})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('chase', response.context['query'])
+        self.assertEqual([self.dogs], list(response.context['object_list']))
+        self.assertContains(response, self.dogs.get_absolute_url())
+
+
 class TemplateTagTests(TestCase):
 
     def test_recent_posts_tag(self):
@@ -477,3 +1821,128 @@ class TemplateTagTests(TestCase):
         )
         result = t.render(template.Context({}))
         self.assertHTMLEqual("<h1>{0.title}</h1><h1>{1.title}</h1>".format(three, two), result)
+
+    def test_recent_posts_tag_loads_every_field_in_one_query(self):
+        for title in ("Post One", "Post Two"):
+            make_blog_post(title=title, content='<p>%s <img src="http://example.com/a.jpg" /></p>' % title)
+
+        t = template.Template(
+            """{% load blogger_tags %}{% get_recent_posts 2 as posts %}{% for post in posts %}
+              {{ post.title }} {{ post.author }} {{ post.first_image_url }} {{ post.content }} {{ post.teaser }}
+            {% endfor %}"""
+        )
+        with self.assertNumQueries(1):
+            result = t.render(template.Context({}))
+        self.assertIn("http://example.com/a.jpg", result)
+
+    def test_render_latest_blog_posts_renders_teasers_in_one_query(self):
+        make_blog_post(title="Post One", content="<p>One two three</p>")
+
+        t = template.Template("{% load blogger_tags %}{% render_latest_blog_posts 5 %}")
+        with self.assertNumQueries(1):
+            result = t.render(template.Context({}))
+        self.assertIn("One two three ...", result)
+
+
+class MonthLinksTagTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.template = template.Template("{% load blogger_tags %}{% render_month_links %}")
+
+    def test_renders_months_newest_first_with_post_counts(self):
+        make_blog_post(published=datetime.datetime(2012, 1, 5))
+        make_blog_post(published=datetime.datetime(2012, 1, 20))
+        make_blog_post(published=datetime.datetime(2012, 3, 1))
+
+        result = self.template.render(template.Context({}))
+        self.assertHTMLEqual("""
+            <ul class="linklist">
+              <li><a href="%s">March 2012</a> (1)</li>
+              <li><a href="%s">January 2012</a> (2)</li>
+            </ul>""" % (
+            reverse("blogger:archive_month", kwargs={'year': 2012, 'month': 3}),
+            reverse("blogger:archive_month", kwargs={'year': 2012, 'month': 1}),
+        ), result)
+
+    def test_month_index_is_cached_between_renders(self):
+        make_blog_post(published=datetime.datetime(2012, 1, 5))
+        self.template.render(template.Context({}))
+
+        with self.assertNumQueries(0):
+            self.template.render(template.Context({}))
+
+    def test_month_index_is_rebuilt_after_sync_changes_posts(self):
+        make_blog_post(published=datetime.datetime(2012, 1, 5))
+        self.assertEqual([(datetime.date(2012, 1, 1), 1)], models.BloggerPost.get_month_index())
+
+        with committed():
+            models.sync_blog_entries(make_feed_page(['1']).entries)
+        self.assertEqual(
+            [(datetime.date(2011, 7, 1), 1), (datetime.date(2012, 1, 1), 1)], models.BloggerPost.get_month_index()
+        )
+
+
+class QueryBudgetTests(TestCase):
+    """
+    The most queries each page and template tag may run, whatever the number
+    of posts, so a template change that queries per post fails here.
+    """
+    BUDGETS = {
+        'home': 2,
+        'post': 2,
+        'archive_year': 2,
+        'archive_month': 2,
+        'get_recent_posts': 1,
+        'render_latest_blog_posts': 1,
+        'render_month_links': 1,
+    }
+
+    def setUp(self):
+        caching.get_cache().clear()
+        rendering.clear_version()
+        self.posts = [
+            make_blog_post(
+                title="Post %d" % i,
+                content='<p>Post %d <img src="http://example.com/%d.jpg" /></p>' % (i, i),
+                published=datetime.datetime(2012 + i // 20, i % 12 + 1, i % 28 + 1),
+            )
+            for i in range(40)
+        ]
+
+    def assertWithinBudget(self, name, func):
+        with CaptureQueriesContext(connection) as queries:
+            result = func()
+        self.assertLessEqual(len(queries), self.BUDGETS[name], '%s ran %d queries:\n%s' % (
+            name, len(queries), '\n'.join(query['sql'] for query in queries)))
+        return result
+
+    def render_tag(self, tag):
+        return template.Template("{% load blogger_tags %}" + tag).render(template.Context({}))
+
+    def assertPageWithinBudget(self, name, url):
+        # a page that stopped being found would be cheap too
+        response = self.assertWithinBudget(name, lambda: self.client.get(url))
+        self.assertEqual(200, response.status_code, '%s returned %d' % (name, response.status_code))
+
+    def assertPagesWithinBudget(self):
+        self.assertPageWithinBudget('home', reverse("blogger:home"))
+        self.assertPageWithinBudget('post', self.posts[0].get_absolute_url())
+        self.assertPageWithinBudget('archive_year', reverse("blogger:archive_year", kwargs={'year': 2012}))
+        self.assertPageWithinBudget(
+            'archive_month', reverse("blogger:archive_month", kwargs={'year': 2012, 'month': '01'}))
+
+    def test_pages_stay_within_budget(self):
+        self.assertPagesWithinBudget()
+
+    def test_prerendered_pages_stay_within_budget(self):
+        with mock.patch.object(config, 'prerender_posts', True):
+            models.render_posts()
+            self.assertPagesWithinBudget()
+
+    def test_template_tags_stay_within_budget(self):
+        self.assertWithinBudget('get_recent_posts', lambda: self.render_tag(
+            "{% get_recent_posts 10 as posts %}{% for post in posts %}{{ post.get_absolute_url }}{% endfor %}"))
+        self.assertWithinBudget(
+            'render_latest_blog_posts', lambda: self.render_tag("{% render_latest_blog_posts 10 %}"))
+        self.assertWithinBudget('render_month_links', lambda: self.render_tag("{% render_month_links %}"))
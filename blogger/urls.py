@@ -8,6 +8,8 @@ from blogger import views
 
 urlpatterns = [
     url(r'^pubsubhubbub/', csrf_exempt(views.PubSubHubbub.as_view()), name="hubbub"),
+    url(r'^search/$', views.PostSearch.as_view(), name='search'),
+    url(r'^feed/$', views.PostFeed.as_view(), name='feed'),
     url(r'^(?P<year>\d{4})/$', views.ArchiveYear.as_view(), name='archive_year'),
     url(r'^(?P<year>\d{4})/(?P<month>\w+)/$', views.ArchiveMonth.as_view(), name='archive_month'),
     url(r'^(?P<slug>[\w/-]+)/$', views.PostDetail.as_view(), name='post'),
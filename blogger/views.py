@@ -1,12 +1,115 @@
+from calendar import timegm
+from datetime import datetime
+from hashlib import md5
 import logging
 
 from django import http
 from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date
 from django.views import generic
 
 import feedparser
 
-from blogger import models, config
+from blogger import caching, models, config, rendering
+from blogger.instrumentation import SyncStats, record_sync
+from blogger.pagination import CursorPaginationMixin, get_static_page
+
+
+def get_freshness(queryset, *extra):
+    """
+    Returns the (ETag, Last-Modified timestamp) of a page showing the posts
+    in ``queryset``, from one aggregate query. The ETag follows their latest
+    ``updated`` and their count, so edits, new posts and deletions all change
+    it, plus anything in ``extra``. Both are None when there are no posts.
+    """
+    stats = queryset.order_by().aggregate(latest=Max('updated'), count=Count('pk'))
+    return make_freshness(stats['latest'], stats['count'], *extra)
+
+
+def make_freshness(latest, count, *extra):
+    if not count:
+        return None, None
+    key = '|'.join(str(part) for part in (latest, count) + extra)
+    return '"%s"' % md5(key.encode('utf-8')).hexdigest(), timegm(latest.timetuple())
+
+
+def set_freshness_headers(response, etag, last_modified):
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalResponseMixin(object):
+    """
+    Sends ETag and Last-Modified headers worked out from the posts a page
+    shows and answers conditional GET and HEAD requests with a 304 before
+    anything is rendered. The ETag also follows the post template version,
+    so deploying template changes doesn't leave browsers with old pages.
+    With 'cache_pages' on the headers are cached too, so revalidating costs
+    no queries either.
+    """
+
+    def get_freshness_queryset(self):
+        return models.BloggerPost.objects.all()
+
+    def get_freshness(self):
+        try:
+            queryset = self.get_freshness_queryset()
+        except ValueError:
+            # bad url arguments, left for the view to turn into a 404
+            return None, None
+        return get_freshness(queryset, rendering.get_version())
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super(ConditionalResponseMixin, self).dispatch(request, *args, **kwargs)
+
+        if config.cache_pages:
+            etag, last_modified = caching.get_or_set(
+                caching.get_page_key(request) + ':freshness', self.get_freshness)
+        else:
+            etag, last_modified = self.get_freshness()
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super(ConditionalResponseMixin, self).dispatch(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            set_freshness_headers(response, etag, last_modified)
+        return response
+
+
+class CachedPageMixin(object):
+    """
+    Serves whole pages from the cache when the 'cache_pages' option is on.
+    Pages are keyed by url and dropped as soon as a sync changes posts.
+    Requests from logged in users and pages rendered for the static export,
+    which link their pages differently, are never cached.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        user = getattr(request, 'user', None)
+        if (not config.cache_pages or request.method not in ('GET', 'HEAD') or (user and user.is_authenticated) or
+                get_static_page(request) is not None):
+            return super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+
+        key = caching.get_page_key(request)
+        cached = caching.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return http.HttpResponse(content, content_type=content_type)
+
+        response = super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, 'render'):
+                response.render()
+            caching.set(key, (response.content, response['Content-Type']))
+        return response
 
 
 class PostContextMixin(object):
@@ -20,27 +123,213 @@ class PostContextMixin(object):
         return ctx
 
 
-class PostList(PostContextMixin, generic.ListView):
+class PostList(ConditionalResponseMixin, CachedPageMixin, PostContextMixin, CursorPaginationMixin, generic.ListView):
     model = models.BloggerPost
-    queryset = models.BloggerPost.get_latest_posts()
+
+    def get_queryset(self):
+        posts = models.BloggerPost.objects.listing()
+        return posts.prerendered() if config.prerender_posts else posts
+
+    def get_paginate_by(self, queryset):
+        return config.recent_post_count
 
 
-class PostDetail(PostContextMixin, generic.DetailView):
+class PostDetail(ConditionalResponseMixin, CachedPageMixin, PostContextMixin, generic.DetailView):
     model = models.BloggerPost
 
+    def get_freshness_queryset(self):
+        return models.BloggerPost.objects.filter(slug=self.kwargs['slug'])
+
+    def get_queryset(self):
+        posts = models.BloggerPost.objects.all()
+        return posts.prerendered() if config.prerender_posts else posts
+
+
+class ArchiveIndexMixin(object):
+    """
+    Answers what the date based generic views would otherwise aggregate
+    posts for, from the cached ``ArchiveIndex``: the freshness headers,
+    whether the archive has posts at all, its months and the archives
+    before and after it. Only the page of posts itself is queried.
+    Views define ``get_archive_months()``, returning the rows of
+    ``get_index_months()`` the archive covers.
+    """
+
+    def get_index_months(self):
+        """
+        The ArchiveIndex rows, leaving out months whose posts are all in the
+        future unless the view allows them.
+        """
+        months = models.ArchiveIndex.get_months()
+        if not self.get_allow_future():
+            now = datetime.now()
+            months = [row for row in months if row.first_published <= now]
+        return months
 
-class ArchiveMonth(PostContextMixin, generic.MonthArchiveView):
+    def get_freshness(self):
+        try:
+            months = self.get_archive_months()
+        except ValueError:
+            # bad url arguments, left for the view to turn into a 404
+            return None, None
+        if not months:
+            return None, None
+        return make_freshness(
+            max(month.last_updated for month in months),
+            sum(month.post_count for month in months),
+            rendering.get_version(),
+        )
+
+    def get_dated_queryset(self, **lookup):
+        if not self.get_archive_months():
+            raise http.Http404('No posts in this archive')
+        queryset = self.get_queryset().filter(**lookup)
+        if not self.get_allow_future():
+            queryset = queryset.filter(**{'%s__lte' % self.get_date_field(): datetime.now()})
+        return queryset
+
+    def get_adjacent_month(self, month, is_previous):
+        months = [
+            row for row in self.get_index_months()
+            if ((row.year, row.month) < month if is_previous else (row.year, row.month) > month)
+        ]
+        if not months:
+            return None
+        return (months[-1] if is_previous else months[0]).date
+
+
+class ArchiveMonth(
+        ArchiveIndexMixin, ConditionalResponseMixin, CachedPageMixin, PostContextMixin, CursorPaginationMixin,
+        generic.MonthArchiveView):
     model = models.BloggerPost
+    queryset = models.BloggerPost.objects.links()
     date_field = 'published'
     month_format = "%m"
 
+    def get_paginate_by(self, queryset):
+        return config.archive_page_size
+
+    def get_archive_months(self):
+        month = int(self.kwargs['year']), int(self.kwargs['month'])
+        return [row for row in self.get_index_months() if (row.year, row.month) == month]
+
+    def get_date_list(self, queryset, date_type=None, ordering='ASC'):
+        # the days with posts aren't indexed, left lazy so only templates using them pay for the query
+        return queryset.datetimes(self.get_date_field(), date_type or self.get_date_list_period(), ordering)
+
+    def get_next_month(self, date):
+        return self.get_adjacent_month((date.year, date.month), is_previous=False)
+
+    def get_previous_month(self, date):
+        return self.get_adjacent_month((date.year, date.month), is_previous=True)
 
-class ArchiveYear(PostContextMixin, generic.YearArchiveView):
+
+class ArchiveYear(
+        ArchiveIndexMixin, ConditionalResponseMixin, CachedPageMixin, PostContextMixin, CursorPaginationMixin,
+        generic.YearArchiveView):
     model = models.BloggerPost
+    queryset = models.BloggerPost.objects.links()
     date_field = 'published'
     make_object_list = True
     month_format = "%m"
 
+    def get_paginate_by(self, queryset):
+        return config.archive_page_size
+
+    def get_archive_months(self):
+        year = int(self.kwargs['year'])
+        return [row for row in self.get_index_months() if row.year == year]
+
+    def get_date_list(self, queryset, date_type=None, ordering='ASC'):
+        months = [datetime(row.year, row.month, 1) for row in self.get_archive_months()]
+        return months[::-1] if ordering == 'DESC' else months
+
+    def get_next_year(self, date):
+        month = self.get_adjacent_month((date.year, 12), is_previous=False)
+        return month and month.replace(month=1)
+
+    def get_previous_year(self, date):
+        month = self.get_adjacent_month((date.year, 1), is_previous=True)
+        return month and month.replace(month=1)
+
+
+class PostSearch(PostContextMixin, generic.ListView):
+    model = models.BloggerPost
+    template_name_suffix = '_search'
+
+    def get_query(self):
+        return self.request.GET.get('q', '').strip()
+
+    def get_queryset(self):
+        return models.BloggerPost.objects.teasers().search(self.get_query())[:config.search_results]
+
+    def get_context_data(self, **kwargs):
+        ctx = super(PostSearch, self).get_context_data(**kwargs)
+        ctx['query'] = self.get_query()
+        return ctx
+
+
+class LatestPostsFeed(Feed):
+    """
+    Atom feed of the latest 'recent_post_count' posts.
+    """
+    feed_type = Atom1Feed
+
+    def title(self):
+        return config.feed_title
+
+    def link(self):
+        return reverse('blogger:home')
+
+    def items(self):
+        return models.BloggerPost.objects.listing()[:config.recent_post_count]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.content
+
+    def item_link(self, item):
+        return item.get_absolute_url()
+
+    def item_guid(self, item):
+        return item.post_id
+
+    item_guid_is_permalink = False
+
+    def item_author_name(self, item):
+        return item.author
+
+    def item_pubdate(self, item):
+        return item.published
+
+    def item_updateddate(self, item):
+        return item.updated
+
+
+class PostFeed(generic.View):
+    """
+    Serves ``LatestPostsFeed`` from the cache, building it again only after
+    a sync changes posts, and answers conditional requests with a 304.
+    """
+
+    def get(self, request, *args, **kwargs):
+        key = caching.get_feed_key(request)
+        cached = caching.get(key)
+        if cached is None:
+            cached = self.build_feed(request)
+            caching.set(key, cached)
+        content, content_type, etag, last_modified = cached
+
+        response = set_freshness_headers(http.HttpResponse(content, content_type=content_type), etag, last_modified)
+        return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+
+    def build_feed(self, request):
+        etag, last_modified = get_freshness(models.BloggerPost.objects.all())
+        response = LatestPostsFeed()(request)
+        return response.content, response['Content-Type'], etag, last_modified
+
 
 class PubSubHubbub(generic.TemplateView):
 
@@ -63,16 +352,24 @@ class PubSubHubbub(generic.TemplateView):
     def post(self, request, *args, **kwargs):
         """
         Handles Feed update from hub server. Updates when necessary
-        and ignores bad requests.
+        and ignores bad requests. With the 'hubbub_queue' option on
+        updates are only stored here and applied by the
+        processhubbubqueue management command.
         """
-        feed = feedparser.parse(request.body)
+        stats = SyncStats()
+        stats.bytes = len(request.body)
+        with stats.stage('parse'):
+            feed = feedparser.parse(request.body)
 
-        feed_links = models.get_all_feed_links(feed.feed.links)
-        subscription = models.HubbubSubscription.get_by_url_list(feed_links)
-        if subscription:
-            models.sync_blog_feed(feedparser.parse(request.body))
+        feed_links = models.get_all_feed_links(feed.feed.get('links', []))
+        subscriptions = models.HubbubSubscription.get_by_url_list(feed_links)
+        if subscriptions and config.hubbub_queue:
+            models.HubbubDelivery.objects.create(topic_url=subscriptions[0].topic_url, body=request.body)
+        elif subscriptions:
+            with record_sync('hubbub', subscriptions[0].topic_url, stats=stats):
+                models.sync_blog_entries(feed.entries, stats=stats)
         else:
-            feed_url = models.get_feed_link(feed.feed.links, 'self')
+            feed_url = models.get_feed_link(feed.feed.get('links', []), 'self')
             logging.warn("Discarding unknown feed: %s", feed_url)
 
         return http.HttpResponse(status=204)